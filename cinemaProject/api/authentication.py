@@ -0,0 +1,71 @@
+from django.conf import settings
+from django.core.cache import cache
+from django.utils.translation import gettext_lazy as _
+from rest_framework import exceptions
+from rest_framework.authentication import TokenAuthentication
+from rest_framework.authtoken.models import Token
+
+
+def token_cache_key(key):
+    return f"auth-token:{key}"
+
+
+def get_token(key):
+    # api.signals drops cached tokens when the token is deleted or its user is saved;
+    # the balance is deferred so it is always read from the database when a view needs it,
+    # the password hash so it never ends up in a shared cache
+    timeout = settings.TOKEN_CACHE_TIMEOUT
+    token = cache.get(token_cache_key(key)) if timeout else None
+    if token is None:
+        token = Token.objects.select_related('user').defer('user__money', 'user__total_spent', 'user__password').get(key=key)
+        if timeout:
+            cache.set(token_cache_key(key), token, timeout=timeout)
+    return token
+
+
+def forget_token(key):
+    cache.delete(token_cache_key(key))
+
+
+def get_request_token(request, key):
+    # resolved once per request, AutoInvalidTokenMiddleware and CachedTokenAuthentication share it
+    token = getattr(request, 'auth_token', None)
+    if token is None or token.key != key:
+        token = request.auth_token = get_token(key)
+    return token
+
+
+def forget_request_token(request):
+    request.auth_token = None
+
+
+def last_request_key(user_id):
+    return f"last-request:{user_id}"
+
+
+def get_last_request(user):
+    return max(user.last_request, cache.get(last_request_key(user.pk), user.last_request))
+
+
+def touch_last_request(token, now):
+    # the cache keeps the exact last request, the user row is written at most once per interval
+    user = token.user
+    cache.set(last_request_key(user.pk), now, timeout=settings.TOKEN_IDLE_TIMEOUT.total_seconds())
+    if user.touch_last_request(now, settings.LAST_REQUEST_WRITE_INTERVAL):
+        forget_token(token.key)
+
+
+class CachedTokenAuthentication(TokenAuthentication):
+    resolved_token = None
+
+    def authenticate(self, request):
+        self.resolved_token = getattr(request._request, 'auth_token', None)
+        return super().authenticate(request)
+
+    def authenticate_credentials(self, key):
+        token = self.resolved_token
+        if token is None or token.key != key:
+            return super().authenticate_credentials(key)
+        if not token.user.is_active:
+            raise exceptions.AuthenticationFailed(_('User inactive or deleted.'))
+        return token.user, token
@@ -0,0 +1,57 @@
+from django.urls import reverse
+
+URL_SENTINEL = "8675309"
+
+
+def get_url_template(request, view_name):
+    url = reverse(view_name, kwargs={"pk": URL_SENTINEL})
+    if request is not None:
+        url = request.build_absolute_uri(url)
+    prefix, suffix = url.split(URL_SENTINEL)
+    return prefix, suffix
+
+
+def to_iso(value):
+    return None if value is None else value.isoformat()
+
+
+def to_decimal_string(value):
+    return None if value is None else f"{value:f}"
+
+
+class SessionFastSerializer:
+    fields = (
+        "id", "movie_id", "time_start", "time_end", "date_start", "date_end", "session_date", "price", "hall_id",
+        "available_seats",
+    )
+
+    def __init__(self, request=None):
+        self.url_prefix, self.url_suffix = get_url_template(request, "session-detail")
+
+    def to_representation(self, row):
+        return {
+            "id": row["id"],
+            "url": f"{self.url_prefix}{row['id']}{self.url_suffix}",
+            "movie": row["movie_id"],
+            "time_start": to_iso(row["time_start"]),
+            "time_end": to_iso(row["time_end"]),
+            "date_start": to_iso(row["date_start"]),
+            "date_end": to_iso(row["date_end"]),
+            "session_date": to_iso(row["session_date"]),
+            "price": to_decimal_string(row["price"]),
+            "hall": row["hall_id"],
+            "available_seats": row["available_seats"],
+        }
+
+    def serialize(self, rows):
+        return [self.to_representation(row) for row in rows]
+
+
+class SessionSeatFastSerializer:
+    fields = ("id", "session_id", "seat_id", "is_booked")
+
+    def to_representation(self, row):
+        return {"id": row["id"], "session": row["session_id"], "seat": row["seat_id"], "is_booked": row["is_booked"]}
+
+    def serialize(self, rows):
+        return [self.to_representation(row) for row in rows]
@@ -0,0 +1,216 @@
+import json
+import os
+import random
+import time
+import tracemalloc
+import uuid
+from datetime import date, datetime, time as dt_time
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.exceptions import DisallowedHost
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.http import HttpRequest
+from django.urls import reverse
+from rest_framework.test import APIClient
+from cinema.booking import book_seats
+from cinema.cache import bump_listing_version
+from cinema.factories import UserFactory
+from cinema.management.bench import bench_database
+from cinema.models import Movie, MovieHall, Seat, Session
+from core.middleware import QueryRecorder
+
+User = get_user_model()
+
+DAY_END = 23 * 60 + 59
+
+# name, url name, whether the request is anonymous
+ENDPOINTS = (
+    ("SessionListToday", "index", True),
+    ("SessionViewSet.list", "session-list", True),
+    ("SessionSeatDetail.get", "sessionseat-detail", False),
+    ("UserOrdersView", "orders", False),
+    ("UserViewSet.orders", "user-orders", False),
+)
+
+
+class Command(BaseCommand):
+    help = "Seeds a large schedule and measures latency, queries and memory of the listing, seat and order endpoints"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--sessions", type=int, default=2000, help="sessions today")
+        parser.add_argument("--halls", type=int, default=20)
+        parser.add_argument("--rows", type=int, default=50)
+        parser.add_argument("--seats-per-row", type=int, default=60)
+        parser.add_argument("--movies", type=int, default=50)
+        parser.add_argument("--order-sessions", type=int, default=20, help="sessions with seats the user booked")
+        parser.add_argument("--orders", type=int, default=200)
+        parser.add_argument("--repeat", type=int, default=20)
+        parser.add_argument("--warm", action="store_true", help="keep listing caches between requests")
+        parser.add_argument("--seed", type=int, default=0)
+        parser.add_argument("--host", default="localhost", help="a host from ALLOWED_HOSTS")
+        parser.add_argument("--output", help="write the JSON report to this file")
+        parser.add_argument("--baseline", help="compare against, or save to, this JSON report")
+        parser.add_argument("--save-baseline", action="store_true")
+        parser.add_argument("--tolerance", type=float, default=0.25, help="allowed slowdown and memory growth")
+
+    def handle(self, *args, **options):
+        self.check_host(options["host"])
+        rng = random.Random(options["seed"])
+        with bench_database():
+            report = self.run(self.seed(rng, options), options)
+
+        for name, result in report["endpoints"].items():
+            self.stdout.write(
+                f"{name}: p50 {result['p50_ms']}ms, max {result['max_ms']}ms, "
+                f"{result['queries']} queries, peak {result['peak_kb']}KB"
+            )
+        if options["output"]:
+            self.write(options["output"], report)
+
+        baseline = options["baseline"]
+        if baseline and options["save_baseline"]:
+            self.write(baseline, report)
+            self.stdout.write(self.style.SUCCESS(f"Saved baseline to {baseline}"))
+        elif baseline:
+            if not os.path.exists(baseline):
+                raise CommandError(f"No baseline at {baseline}, run with --save-baseline first")
+            with open(baseline) as file:
+                regressions = self.compare(json.load(file), report, options["tolerance"])
+            if regressions:
+                raise CommandError("Regressions against the baseline:\n" + "\n".join(regressions))
+            self.stdout.write(self.style.SUCCESS("No regressions against the baseline"))
+
+    @staticmethod
+    def check_host(host):
+        request = HttpRequest()
+        request.META["HTTP_HOST"] = host
+        try:
+            request.get_host()
+        except DisallowedHost:
+            raise CommandError(f"Host '{host}' is not in ALLOWED_HOSTS, pass one that is with --host")
+
+    def seed(self, rng, options):
+        run = uuid.uuid4().hex[:8]
+        today = date.today()
+        movies = Movie.objects.bulk_create([
+            Movie(name=f"Bench movie {number}", description="", image="movies/bench.jpg", rating=rng.randint(10, 99) / 10)
+            for number in range(options["movies"])
+        ])
+        halls = MovieHall.objects.bulk_create([
+            MovieHall(name=f"Bench {run} {number}", rows=options["rows"], seats_per_row=options["seats_per_row"])
+            for number in range(options["halls"])
+        ])
+        for hall in halls:
+            hall.create_seats_for_hall()
+
+        # the rest of today is cut into back to back slots per hall, so sessions in one hall never overlap
+        now = datetime.now()
+        first_minute = now.hour * 60 + now.minute + 1
+        per_hall = -(-options["sessions"] // len(halls))
+        span = (DAY_END - first_minute + 1) // per_hall
+        if span < 2:
+            raise CommandError(
+                f"{options['sessions']} sessions do not fit into {len(halls)} halls before midnight, "
+                f"lower --sessions or raise --halls"
+            )
+        lazy = settings.SESSION_SEATS_MODE == "lazy"
+        sessions = []
+        for number in range(options["sessions"]):
+            start = first_minute + number // len(halls) * span
+            end = start + span - 1
+            sessions.append(Session(
+                movie=rng.choice(movies), hall=halls[number % len(halls)], session_date=today, date_start=today,
+                date_end=today, time_start=dt_time(start // 60, start % 60), time_end=dt_time(end // 60, end % 60),
+                price=rng.randint(5, 20), lazy_seats=lazy, available_seats=options["rows"] * options["seats_per_row"]
+            ))
+        sessions = Session.objects.bulk_create(sessions)
+        bump_listing_version(today)
+
+        user = UserFactory(username=f"bench-{run}")
+        User.objects.filter(pk=user.pk).update(money=10 ** 7)
+        user.money = 10 ** 7
+        order_sessions = sessions[:options["order_sessions"]]
+        for session in order_sessions:
+            session.create_session_seats()
+        for number in range(options["orders"]):
+            session = order_sessions[number % len(order_sessions)]
+            seat_ids = Seat.objects.filter(hall_id=session.hall_id).order_by("pk").values_list("pk", flat=True)
+            index = number // len(order_sessions) * 2
+            book_seats(user, session, list(seat_ids[index:index + 2]))
+        return {"movies": movies, "halls": halls, "sessions": sessions, "user": user, "probe": order_sessions[0]}
+
+    def run(self, seeded, options):
+        user, probe = seeded["user"], seeded["probe"]
+        anonymous = APIClient(HTTP_HOST=options["host"])
+        client = APIClient(HTTP_HOST=options["host"])
+        client.force_login(user)
+        client.force_authenticate(user=user)
+        kwargs = {"sessionseat-detail": {"session_pk": probe.pk}, "user-orders": {"pk": user.pk}}
+
+        endpoints = {}
+        for name, url_name, is_anonymous in ENDPOINTS:
+            url = reverse(url_name, kwargs=kwargs.get(url_name))
+            endpoints[name] = self.measure(
+                anonymous if is_anonymous else client, url, options["repeat"], options["warm"]
+            )
+        return {
+            "started_at": datetime.now().isoformat(timespec="seconds"),
+            "database": connection.vendor,
+            "options": {key: options[key] for key in (
+                "sessions", "halls", "rows", "seats_per_row", "movies", "order_sessions", "orders", "repeat", "warm"
+            )},
+            "endpoints": endpoints,
+        }
+
+    @staticmethod
+    def measure(client, url, repeat, warm):
+        def get():
+            if not warm:
+                bump_listing_version(date.today())
+            response = client.get(url)
+            if response.status_code != 200:
+                raise CommandError(f"GET {url} returned {response.status_code}")
+
+        timings = []
+        for _ in range(repeat):
+            started = time.perf_counter()
+            get()
+            timings.append((time.perf_counter() - started) * 1000)
+        timings.sort()
+
+        queries = QueryRecorder()
+        with connection.execute_wrapper(queries):
+            get()
+        tracemalloc.start()
+        try:
+            get()
+            _, peak = tracemalloc.get_traced_memory()
+        finally:
+            tracemalloc.stop()
+        return {
+            "p50_ms": round(timings[len(timings) // 2], 2),
+            "max_ms": round(timings[-1], 2),
+            "queries": queries.count,
+            "peak_kb": round(peak / 1024, 1),
+        }
+
+    @staticmethod
+    def compare(baseline, report, tolerance):
+        regressions = []
+        for name, result in report["endpoints"].items():
+            base = baseline["endpoints"].get(name)
+            if base is None:
+                continue
+            if result["queries"] > base["queries"]:
+                regressions.append(f"{name}: {result['queries']} queries, baseline {base['queries']}")
+            for key in ("p50_ms", "peak_kb"):
+                if result[key] > base[key] * (1 + tolerance):
+                    regressions.append(f"{name}: {key} {result[key]}, baseline {base[key]}")
+        return regressions
+
+    @staticmethod
+    def write(path, report):
+        with open(path, "w") as file:
+            file.write(json.dumps(report, indent=2) + "\n")
+
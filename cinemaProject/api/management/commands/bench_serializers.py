@@ -0,0 +1,52 @@
+import time
+from django.core.management.base import BaseCommand, CommandError
+from api.fast_serializers import SessionFastSerializer, SessionSeatFastSerializer
+from api.serializers import SessionSerializer, SessionSeatSerializer
+from cinema.models import Session, SessionSeat
+
+
+class Command(BaseCommand):
+    help = "Compares rows/second of the DRF serializers and the fast read serializers on existing rows"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--rows", type=int, default=1000)
+        parser.add_argument("--repeat", type=int, default=5)
+
+    def handle(self, *args, **options):
+        rows, repeat = options["rows"], options["repeat"]
+
+        sessions = list(Session.objects.defer("occupancy").order_by("pk")[:rows])
+        session_seats = list(SessionSeat.objects.order_by("pk")[:rows])
+        if not sessions or not session_seats:
+            raise CommandError("There are no sessions or session seats to serialize, generate some data first")
+        session_rows = list(Session.objects.order_by("pk").values(*SessionFastSerializer.fields)[:rows])
+        seat_rows = list(SessionSeat.objects.order_by("pk").values(*SessionSeatFastSerializer.fields)[:rows])
+
+        # without a request both serializers render relative urls, so no host has to be allowed
+        self.compare(
+            "sessions", len(sessions), repeat,
+            lambda: SessionSerializer(sessions, many=True, context={"request": None}).data,
+            lambda: SessionFastSerializer().serialize(session_rows),
+        )
+        self.compare(
+            "session seats", len(session_seats), repeat,
+            lambda: SessionSeatSerializer(session_seats, many=True).data,
+            lambda: SessionSeatFastSerializer().serialize(seat_rows),
+        )
+
+    def compare(self, name, count, repeat, drf, fast):
+        drf_rate = count / self.measure(drf, repeat)
+        fast_rate = count / self.measure(fast, repeat)
+        self.stdout.write(
+            f"{name}: {count} rows, drf {drf_rate:,.0f} rows/s, fast {fast_rate:,.0f} rows/s, "
+            f"x{fast_rate / drf_rate:.1f}"
+        )
+
+    @staticmethod
+    def measure(serialize, repeat):
+        timings = []
+        for _ in range(repeat):
+            started = time.perf_counter()
+            serialize()
+            timings.append(time.perf_counter() - started)
+        return min(timings)
@@ -1,8 +1,9 @@
-from datetime import datetime, timedelta
+from datetime import datetime
+from django.conf import settings
 from django.contrib.auth import logout
 from django.http import JsonResponse
 from django.utils.deprecation import MiddlewareMixin
-from rest_framework.authtoken.models import Token
+from api.authentication import forget_request_token, get_last_request, get_request_token, touch_last_request
 
 
 class AutoInvalidTokenMiddleware(MiddlewareMixin):
@@ -11,15 +12,15 @@ class AutoInvalidTokenMiddleware(MiddlewareMixin):
             if "Authorization" in request.headers:
                 try:
                     user_token = request.headers['Authorization'].split()[1]
-                    token = Token.objects.get(key=user_token)
+                    token = get_request_token(request, user_token)
                     user = token.user
                 except Exception as e:
                     return JsonResponse(data={"error": "Invalid Token"})
                 if not user.is_staff:
-                    last_request = user.last_request
-                    if datetime.now() - last_request > timedelta(minutes=1):
+                    now = datetime.now()
+                    if now - get_last_request(user) > settings.TOKEN_IDLE_TIMEOUT:
                         logout(request)
                         token.delete()
+                        forget_request_token(request)
                     else:
-                        user.last_request = datetime.now()
-                        user.save()
+                        touch_last_request(token, now)
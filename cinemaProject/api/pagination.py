@@ -0,0 +1,21 @@
+from rest_framework.pagination import CursorPagination
+
+
+class IdCursorPagination(CursorPagination):
+    ordering = ('id',)
+
+
+class OrderHistoryPagination(CursorPagination):
+    ordering = ('-id',)
+
+
+class SessionCursorPagination(CursorPagination):
+    # listings cover a single day, so the cursor is keyed on time_start and only equal times fall back to an offset
+    ordering = ('time_start', 'id')
+
+    def get_ordering(self, request, queryset, view):
+        ordering = request.query_params.get('ordering')
+        if ordering not in getattr(view, 'ordering_fields', []):
+            return self.ordering
+        # the first field is the cursor position, the rest keep pages stable for equal values
+        return (ordering,) + tuple(field for field in self.ordering if field != ordering.lstrip('-'))
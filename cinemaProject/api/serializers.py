@@ -1,8 +1,11 @@
 from datetime import date, time
 
 from django.contrib.auth import get_user_model
+from django.db import transaction
 from rest_framework import serializers
-from cinema.models import MovieHall, Session, SessionSeat, Movie, Order
+from cinema.models import Actor, Director, Genre, HallHasBookedSeats, MovieHall, Session, SessionSeat, Movie
+from cinema.booking import book_seats
+from cinema.scheduling import lock_free_hall, schedule_sessions, SchedulingError
 from rest_framework.authtoken.models import Token
 from rest_framework.response import Response
 
@@ -15,7 +18,7 @@ class UserSerializer(serializers.HyperlinkedModelSerializer):
     password = serializers.CharField(write_only=True, max_length=200)
     first_name = serializers.CharField(required=False, max_length=200)
     last_name = serializers.CharField(required=False, max_length=200)
-    money = serializers.DecimalField(required=False, max_digits=10, decimal_places=2)
+    money = serializers.DecimalField(read_only=True, max_digits=10, decimal_places=2)
 
     class Meta:
         model = User
@@ -70,9 +73,12 @@ class MovieHallSerializer(serializers.ModelSerializer):
         return hall
 
     def update(self, instance, validated_data):
-        instance.delete_seats_and_session_seats()
-        instance = super().update(instance, validated_data)
-        instance.update_seats_for_hall()
+        try:
+            with transaction.atomic():
+                instance = super().update(instance, validated_data)
+                instance.relayout_seats()
+        except HallHasBookedSeats as error:
+            raise serializers.ValidationError(str(error))
         return instance
 
     def validate_rows(self, rows):
@@ -99,7 +105,6 @@ class MovieHallSerializer(serializers.ModelSerializer):
 
 class SessionSerializer(serializers.ModelSerializer):
     url = serializers.HyperlinkedIdentityField(read_only=True, view_name="session-detail")
-    available_seats = serializers.SerializerMethodField(read_only=True)
 
     class Meta:
         model = Session
@@ -124,20 +129,35 @@ class SessionSerializer(serializers.ModelSerializer):
         "invalid_time": "invalid format time"
     }
 
-    def get_available_seats(self, obj):
-        return obj.get_available_seats
-
     def create(self, validated_data):
-        session = Session.objects.create(**validated_data)
-        session.create_session_seats()
+        with transaction.atomic():
+            self.lock_free_hall(validated_data)
+            session = Session.objects.create(**validated_data)
+            session.create_session_seats()
         return session
 
     def update(self, instance, validated_data):
-        instance.delete_session_seats()
-        instance = super().update(instance, validated_data)
-        instance.create_session_seats()
+        with transaction.atomic():
+            self.lock_free_hall(validated_data, instance)
+            instance.delete_session_seats()
+            instance = super().update(instance, validated_data)
+            instance.create_session_seats()
         return instance
 
+    def lock_free_hall(self, validated_data, instance=None):
+        # validate() ran without a lock, the check is repeated under the hall lock that schedule_sessions takes
+        values = {
+            field: validated_data.get(field, getattr(instance, field, None))
+            for field in ("hall", "session_date", "time_start", "time_end")
+        }
+        try:
+            lock_free_hall(**values, session_pk=getattr(instance, "pk", None))
+        except SchedulingError:
+            raise serializers.ValidationError(
+                self.default_error_messages['invalid_session'],
+                code="invalid_session"
+            )
+
     def validate_price(self, price):
         if price <= 0:
             raise serializers.ValidationError(
@@ -157,8 +177,7 @@ class SessionSerializer(serializers.ModelSerializer):
 
     def validate_time(self, time_start, time_end, session_date, hall, session_pk=None):
         if isinstance(time_start, time) and isinstance(time_end, time):
-            if (Session.objects.exists_session_by_time(time_end, session_date, hall)
-                    or Session.objects.exists_session_by_time(time_start, session_date, hall, session_pk)):
+            if Session.objects.exists_overlapping(hall, session_date, time_start, time_end, session_pk):
                 raise serializers.ValidationError(
                     self.default_error_messages['invalid_session'],
                     code=["invalid_session"]
@@ -186,6 +205,32 @@ class SessionSerializer(serializers.ModelSerializer):
         return data
 
 
+class ScheduleSlotSerializer(serializers.Serializer):
+    time_start = serializers.TimeField()
+    time_end = serializers.TimeField()
+
+
+class SessionScheduleSerializer(serializers.Serializer):
+    movie = serializers.PrimaryKeyRelatedField(queryset=Movie.objects.all())
+    hall = serializers.PrimaryKeyRelatedField(queryset=MovieHall.objects.all())
+    date_start = serializers.DateField()
+    date_end = serializers.DateField()
+    price = serializers.DecimalField(max_digits=10, decimal_places=2)
+    slots = ScheduleSlotSerializer(many=True, allow_empty=False)
+
+    def validate_price(self, price):
+        if price <= 0:
+            raise serializers.ValidationError("price should be bigger than 0")
+        return price
+
+    def create(self, validated_data):
+        slots = [(slot['time_start'], slot['time_end']) for slot in validated_data.pop('slots')]
+        try:
+            return schedule_sessions(slots=slots, **validated_data)
+        except SchedulingError as error:
+            raise serializers.ValidationError(str(error))
+
+
 class MovieHallReadSerializer(serializers.ModelSerializer):
     class Meta:
         model = MovieHall
@@ -198,38 +243,47 @@ class MovieReadSerializer(serializers.ModelSerializer):
         fields = ["id", "name", "image", "rating"]
 
 
-class SessionReadSerializer(serializers.ModelSerializer):
-    hall = MovieHallReadSerializer()
-    movie = MovieReadSerializer()
-
+class GenreReadSerializer(serializers.ModelSerializer):
     class Meta:
-        model = Session
-        fields = ["id", "movie", "time_start", "time_end", "date_start", "date_end", "session_date", "price", "hall"]
+        model = Genre
+        fields = ["id", "name"]
 
 
-class SessionSeatReadSerializer(serializers.ModelSerializer):
-    session = SessionReadSerializer()
+class ActorReadSerializer(serializers.ModelSerializer):
+    class Meta:
+        model = Actor
+        fields = ["id", "name", "surname"]
 
+
+class DirectorReadSerializer(serializers.ModelSerializer):
     class Meta:
-        model = SessionSeat
-        fields = ["id", "session", "seat", "order"]
+        model = Director
+        fields = ["id", "name", "surname"]
 
 
-class UserOrdersSerializer(serializers.ModelSerializer):
-    orders = serializers.SerializerMethodField(read_only=True)
-    total_spent = serializers.SerializerMethodField(read_only=True)
+class MovieDetailSerializer(MovieReadSerializer):
+    genres = GenreReadSerializer(many=True, read_only=True)
+    actors = ActorReadSerializer(many=True, read_only=True)
+    directors = DirectorReadSerializer(many=True, read_only=True)
 
-    class Meta:
-        model = User
-        fields = ["id", "username", "email", "first_name", "last_name", "orders", "total_spent"]
+    class Meta(MovieReadSerializer.Meta):
+        fields = MovieReadSerializer.Meta.fields + ["description", "genres", "actors", "directors"]
+
+
+class MovieSearchSerializer(MovieReadSerializer):
+    rank = serializers.FloatField(read_only=True)
 
-    def get_orders(self, obj):
-        seats = SessionSeat.objects.select_related("order", "session__movie", "seat").filter(order__user=obj)
-        serializer = SessionSeatReadSerializer(seats, many=True)
-        return serializer.data
+    class Meta(MovieReadSerializer.Meta):
+        fields = MovieReadSerializer.Meta.fields + ["rank"]
 
-    def get_total_spent(self, obj):
-        return obj.total_spent()
+
+class SessionReadSerializer(serializers.ModelSerializer):
+    hall = MovieHallReadSerializer()
+    movie = MovieReadSerializer()
+
+    class Meta:
+        model = Session
+        fields = ["id", "movie", "time_start", "time_end", "date_start", "date_end", "session_date", "price", "hall"]
 
 
 class SessionSeatListSerializer(serializers.ListSerializer):
@@ -237,13 +291,8 @@ class SessionSeatListSerializer(serializers.ListSerializer):
     def update(self, queryset, validated_data, child=None):
         user = self.context['request'].user
         session = queryset[0].session
-        order = Order.objects.create(user=user, purchase_price=session.price)
-        for data, instance in zip(validated_data, queryset):
-            instance.order = order
-            instance.is_booked = data['is_booked']
-            instance.save()
-            user.buy_ticket(price=session.price)
-        return queryset
+        order = book_seats(user, session, [data['seat'].pk for data in validated_data])
+        return order.session_seats.all()
 
 
 class SessionSeatSerializer(serializers.ModelSerializer):
@@ -254,8 +303,10 @@ class SessionSeatSerializer(serializers.ModelSerializer):
 
     def update(self, instance, validated_data, child=None):
         user = self.context['request'].user
-        order = Order.objects.create(user=user, purchase_price=instance.session.price)
-        user.buy_ticket(price=instance.session.price)
-        SessionSeat.objects.update(pk=validated_data['id'], order=order, is_booked=True)
+        book_seats(user, instance.session, [instance.seat_id])
+        instance.refresh_from_db()
         return instance
 
+
+class SeatHoldSerializer(serializers.Serializer):
+    seats = serializers.ListField(child=serializers.IntegerField(), allow_empty=False)
@@ -0,0 +1,23 @@
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+from rest_framework.authtoken.models import Token
+from .authentication import forget_token
+
+User = get_user_model()
+
+
+@receiver(post_save, sender=Token)
+@receiver(post_delete, sender=Token)
+def forget_changed_token(sender, instance, **kwargs):
+    forget_token(instance.key)
+
+
+@receiver(post_save, sender=User)
+@receiver(post_delete, sender=User)
+def forget_user_tokens(sender, instance, **kwargs):
+    if not settings.TOKEN_CACHE_TIMEOUT:
+        return
+    for key in Token.objects.filter(user_id=instance.pk).values_list('key', flat=True):
+        forget_token(key)
@@ -1,3 +1,439 @@
-from django.test import TestCase
+import base64
+import json
+import os
+import random
+import tempfile
+from datetime import date, datetime, time, timedelta
+from io import StringIO
+from unittest.mock import patch
+from django.conf import settings
+from django.core.cache import cache
+from django.core.management import CommandError, call_command
+from django.db import connection
+from django.test import override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from rest_framework.authtoken.models import Token
+from rest_framework.renderers import JSONRenderer
+from rest_framework.test import APITestCase, APITransactionTestCase
+from api.authentication import last_request_key, token_cache_key
+from api.management.commands.bench_read_path import Command as BenchReadPathCommand
+from api.serializers import SessionSeatSerializer, SessionSerializer
+from api.pagination import IdCursorPagination, OrderHistoryPagination, SessionCursorPagination
+from cinema.booking import book_seats, hold_seats
+from cinema.factories import (
+    ActorFactory, DirectorFactory, GenreFactory, MovieFactory, MovieHallFactory, SuperUserFactory, UserFactory
+)
+from cinema.models import MovieActor, MovieHall, Session
+from cinema.scheduling import schedule_sessions
 
-# Create your tests here.
+media_for_tests = os.path.join(settings.BASE_DIR, 'media_for_tests')
+
+
+class SessionScheduleTests(APITestCase):
+    @override_settings(MEDIA_ROOT=media_for_tests)
+    def setUp(self):
+        self.client.force_authenticate(user=SuperUserFactory())
+        self.movie = MovieFactory()
+        self.hall = MovieHallFactory(rows=2, seats_per_row=5)
+        self.hall.create_seats_for_hall()
+        self.url = reverse('session-schedule')
+        self.date_start = date.today() + timedelta(days=3)
+        self.data = {
+            "movie": self.movie.pk,
+            "hall": self.hall.pk,
+            "date_start": self.date_start,
+            "date_end": self.date_start + timedelta(days=1),
+            "price": "10.00",
+            "slots": [{"time_start": "10:00", "time_end": "12:00"}, {"time_start": "13:00", "time_end": "15:00"}],
+        }
+
+    def test_schedule(self):
+        response = self.client.post(self.url, self.data, format='json')
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(len(response.data), 4)
+        self.assertEqual(Session.objects.count(), 4)
+
+    def test_schedule_conflict(self):
+        self.client.post(self.url, self.data, format='json')
+        response = self.client.post(self.url, self.data, format='json')
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(Session.objects.count(), 4)
+
+    def test_session_create_rechecks_overlap_under_hall_lock(self):
+        self.client.post(self.url, self.data, format='json')
+        data = {
+            "movie": self.movie.pk, "hall": self.hall.pk, "date_start": self.date_start, "date_end": self.date_start,
+            "session_date": self.date_start, "time_start": "11:00", "time_end": "11:30", "price": "10.00",
+        }
+        # validation passing stands in for a session that was saved after it ran
+        with patch('api.serializers.SessionSerializer.validate_time'):
+            response = self.client.post(reverse('session-list'), data, format='json')
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(Session.objects.count(), 4)
+
+
+class CursorPaginationTests(APITestCase):
+    @override_settings(MEDIA_ROOT=media_for_tests)
+    def setUp(self):
+        cache.clear()
+        self.client.force_authenticate(user=UserFactory())
+        self.movie = MovieFactory()
+        self.hall = MovieHallFactory(rows=3, seats_per_row=5)
+        self.hall.create_seats_for_hall()
+        self.tomorrow = date.today() + timedelta(days=1)
+        slots = [(time(hour), time(hour, 30)) for hour in range(10, 15)]
+        self.sessions = schedule_sessions(self.movie, self.hall, slots, self.tomorrow, self.tomorrow, 10)
+
+    def get_all_pages(self, url, params=None):
+        ids = []
+        while url:
+            response = self.client.get(url, params)
+            self.assertNotIn('count', response.data)
+            ids += [item['id'] for item in response.data['results']]
+            url, params = response.data['next'], None
+        return ids
+
+    @patch.object(SessionCursorPagination, 'page_size', 2)
+    def test_tomorrow_sessions(self):
+        ids = self.get_all_pages(reverse('session-tomorrow'))
+        self.assertEqual(ids, [session.pk for session in self.sessions])
+
+    @patch.object(SessionCursorPagination, 'page_size', 2)
+    def test_tomorrow_sessions_ordering(self):
+        ids = self.get_all_pages(reverse('session-tomorrow'), {"ordering": "-time_start"})
+        self.assertEqual(ids, [session.pk for session in reversed(self.sessions)])
+
+    @patch.object(SessionCursorPagination, 'page_size', 2)
+    def test_next_page_has_no_offset(self):
+        response = self.client.get(reverse('session-tomorrow'))
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(response.data['next'])
+        self.assertEqual([item['id'] for item in response.data['results']], [session.pk for session in self.sessions[2:4]])
+        session_queries = [query['sql'] for query in queries if 'FROM "session"' in query['sql']]
+        self.assertTrue(session_queries)
+        self.assertFalse([sql for sql in session_queries if 'OFFSET' in sql])
+
+    @patch.object(IdCursorPagination, 'page_size', 4)
+    def test_session_seats(self):
+        session = self.sessions[0]
+        url = reverse('sessionseat-detail', kwargs={"session_pk": session.pk})
+        ids = self.get_all_pages(url)
+        self.assertEqual(ids, list(session.session_seats.order_by('id').values_list('id', flat=True)))
+
+    @override_settings(SESSION_SEATS_MODE="lazy")
+    @patch.object(IdCursorPagination, 'page_size', 4)
+    def test_lazy_session_seats(self):
+        session = schedule_sessions(self.movie, self.hall, [(time(20), time(22))], self.tomorrow, self.tomorrow, 10)[0]
+        url = reverse('sessionseat-detail', kwargs={"session_pk": session.pk})
+        response = self.client.get(url)
+        self.assertEqual(
+            [item['seat'] for item in response.data['results']],
+            list(self.hall.seats.order_by('pk').values_list('pk', flat=True)[:4])
+        )
+        self.assertIsNotNone(response.data['next'])
+
+
+class SessionSeatMapTests(APITestCase):
+    @override_settings(MEDIA_ROOT=media_for_tests)
+    def setUp(self):
+        self.user = UserFactory()
+        self.user.money = 1000
+        self.user.save(update_fields=['money'])
+        self.other_user = UserFactory()
+        self.client.force_authenticate(user=self.user)
+        self.hall = MovieHallFactory(rows=2, seats_per_row=5)
+        self.hall.create_seats_for_hall()
+        tomorrow = date.today() + timedelta(days=1)
+        self.session = schedule_sessions(MovieFactory(), self.hall, [(time(10), time(12))], tomorrow, tomorrow, 10)[0]
+        self.seat_ids = list(self.hall.seats.order_by('pk').values_list('pk', flat=True))
+        self.url = reverse('seat-map', kwargs={"session_pk": self.session.pk})
+
+    def test_seat_map(self):
+        book_seats(self.user, self.session, self.seat_ids[:2])
+        hold_seats(self.other_user, self.session, self.seat_ids[6:7])
+        with self.assertNumQueries(2):
+            response = self.client.get(self.url)
+        self.assertEqual((response.data['rows'], response.data['seats_per_row']), (2, 5))
+        self.assertEqual(base64.b64decode(response.data['booked']), bytes([0b11, 0]))
+        self.assertEqual(base64.b64decode(response.data['held']), bytes([0b1000000, 0]))
+
+    def test_not_modified(self):
+        etag = self.client.get(self.url)['ETag']
+        with self.assertNumQueries(1):
+            response = self.client.get(self.url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 304)
+        book_seats(self.user, self.session, self.seat_ids[:1])
+        response = self.client.get(self.url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertNotEqual(response['ETag'], etag)
+
+    def test_holds_change_etag(self):
+        etag = self.client.get(self.url)['ETag']
+        hold_seats(self.other_user, self.session, self.seat_ids[:1])
+        self.assertEqual(self.client.get(self.url, HTTP_IF_NONE_MATCH=etag).status_code, 200)
+
+    def test_expired_hold_changes_etag(self):
+        expires_at = hold_seats(self.other_user, self.session, self.seat_ids[:1])
+        etag = self.client.get(self.url)['ETag']
+        self.assertEqual(self.client.get(self.url, HTTP_IF_NONE_MATCH=etag).status_code, 304)
+
+        class frozen(datetime):
+            @classmethod
+            def now(cls, tz=None):
+                return expires_at + timedelta(seconds=1)
+
+        with patch('cinema.managers.datetime', frozen):
+            response = self.client.get(self.url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(base64.b64decode(response.data['held']), bytes(2))
+
+
+class OrderHistoryTests(APITestCase):
+    @override_settings(MEDIA_ROOT=media_for_tests)
+    def setUp(self):
+        self.user = UserFactory()
+        self.user.money = 1000
+        self.user.save(update_fields=['money'])
+        self.client.force_authenticate(user=self.user)
+        self.hall = MovieHallFactory(rows=2, seats_per_row=5)
+        self.hall.create_seats_for_hall()
+        tomorrow = date.today() + timedelta(days=1)
+        self.sessions = schedule_sessions(
+            MovieFactory(), self.hall, [(time(10), time(12)), (time(13), time(15))], tomorrow, tomorrow, 10
+        )
+        self.seat_ids = list(self.hall.seats.order_by('pk').values_list('pk', flat=True))
+        self.url = reverse('user-orders', kwargs={"pk": self.user.pk})
+
+    def test_orders_are_grouped(self):
+        first = book_seats(self.user, self.sessions[0], self.seat_ids[:2])
+        second = book_seats(self.user, self.sessions[1], self.seat_ids[5:6])
+        response = self.client.get(self.url)
+        self.assertEqual([order['id'] for order in response.data['results']], [second.pk, first.pk])
+        self.assertEqual(
+            [seat['id'] for seat in response.data['results'][1]['seats']], self.seat_ids[:2]
+        )
+        self.assertEqual(response.data['results'][1]['session']['id'], self.sessions[0].pk)
+        self.assertEqual(response.data['total_spent'], "30.00")
+
+    def test_query_count_does_not_depend_on_orders(self):
+        book_seats(self.user, self.sessions[0], self.seat_ids[:1])
+        with CaptureQueriesContext(connection) as one_order:
+            self.client.get(self.url)
+        for seat_id in self.seat_ids[1:6]:
+            book_seats(self.user, self.sessions[1], [seat_id])
+        with CaptureQueriesContext(connection) as many_orders:
+            self.client.get(self.url)
+        self.assertEqual(len(one_order), len(many_orders))
+
+    @patch.object(OrderHistoryPagination, 'page_size', 2)
+    def test_orders_are_paginated(self):
+        orders = [book_seats(self.user, self.sessions[0], [seat_id]) for seat_id in self.seat_ids[:3]]
+        response = self.client.get(self.url)
+        self.assertEqual(len(response.data['results']), 2)
+        response = self.client.get(response.data['next'])
+        self.assertEqual([order['id'] for order in response.data['results']], [orders[0].pk])
+
+
+class UserApiTests(APITestCase):
+    def setUp(self):
+        self.user = UserFactory()
+        self.client.force_authenticate(user=self.user)
+        self.url = reverse('user-detail', kwargs={"pk": self.user.pk})
+
+    def test_balance_is_read_only(self):
+        response = self.client.patch(self.url, {"money": "5000.00", "first_name": "Neo"})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data['money'], "200.00")
+        self.user.refresh_from_db()
+        self.assertEqual(self.user.money, 200)
+        self.assertEqual(self.user.first_name, "Neo")
+
+
+class MovieApiTests(APITestCase):
+    @override_settings(MEDIA_ROOT=media_for_tests)
+    def setUp(self):
+        cache.clear()
+        self.genre = GenreFactory()
+        self.actor = ActorFactory()
+        self.movies = [
+            MovieFactory(genres=[self.genre], actors=[self.actor], directors=[DirectorFactory()]) for _ in range(3)
+        ]
+
+    def test_list_query_count_does_not_depend_on_movies(self):
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(reverse('movie-list'))
+        self.assertEqual(len(queries), 5)
+        self.assertEqual([movie['id'] for movie in response.data['results']], [movie.pk for movie in self.movies])
+        self.assertEqual(response.data['results'][0]['actors'][0]['surname'], self.actor.surname)
+        self.assertTrue(response.data['results'][0]['image'].startswith('http://testserver/'))
+        with self.assertNumQueries(1):
+            self.client.get(reverse('movie-list'))
+
+    def test_detail_is_invalidated(self):
+        url = reverse('movie-detail', kwargs={"pk": self.movies[0].pk})
+        self.assertEqual(len(self.client.get(url).data['genres']), 1)
+        self.movies[0].genres.add(GenreFactory())
+        self.assertEqual(len(self.client.get(url).data['genres']), 2)
+        self.genre.name = "Renamed"
+        self.genre.save()
+        self.assertIn("Renamed", [genre['name'] for genre in self.client.get(url).data['genres']])
+        MovieActor.objects.filter(movie=self.movies[0]).delete()
+        self.assertEqual(self.client.get(url).data['actors'], [])
+
+    def test_missing_movie(self):
+        self.assertEqual(self.client.get(reverse('movie-detail', kwargs={"pk": 0})).status_code, 404)
+
+
+class FastSerializerTests(APITestCase):
+    @override_settings(MEDIA_ROOT=media_for_tests)
+    def setUp(self):
+        cache.clear()
+        self.hall = MovieHallFactory(rows=2, seats_per_row=5)
+        self.hall.create_seats_for_hall()
+        tomorrow = date.today() + timedelta(days=1)
+        self.sessions = schedule_sessions(
+            MovieFactory(), self.hall, [(time(10), time(12)), (time(13), time(15, 30))], tomorrow, tomorrow, 12.5
+        )
+
+    def test_sessions_match_model_serializer(self):
+        response = self.client.get(reverse('session-tomorrow'))
+        queryset = Session.objects.filter(pk__in=[session.pk for session in self.sessions]).order_by('time_start')
+        expected = SessionSerializer(queryset, many=True, context={"request": response.wsgi_request}).data
+        self.assertEqual(response.json()['results'], json.loads(JSONRenderer().render(expected)))
+
+    def test_session_seats_match_model_serializer(self):
+        self.client.force_authenticate(user=UserFactory())
+        session = self.sessions[0]
+        response = self.client.get(reverse('sessionseat-detail', kwargs={"session_pk": session.pk}))
+        expected = SessionSeatSerializer(session.session_seats.order_by('id')[:10], many=True).data
+        self.assertEqual(response.json()['results'], json.loads(JSONRenderer().render(expected)))
+
+    def test_bench_serializers(self):
+        out = StringIO()
+        call_command('bench_serializers', '--rows', '10', '--repeat', '1', stdout=out)
+        self.assertIn("sessions: 2 rows", out.getvalue())
+
+
+class BenchReadPathTests(APITransactionTestCase):
+    def test_bench_read_path_against_baseline(self):
+        options = [
+            '--sessions', '10', '--halls', '2', '--rows', '3', '--seats-per-row', '4', '--movies', '2',
+            '--order-sessions', '2', '--orders', '4', '--repeat', '1', '--host', 'testserver'
+        ]
+        with tempfile.TemporaryDirectory() as directory:
+            baseline = os.path.join(directory, 'baseline.json')
+            call_command('bench_read_path', *options, '--baseline', baseline, '--save-baseline', stdout=StringIO())
+            with open(baseline) as file:
+                report = json.load(file)
+            self.assertEqual(len(report['endpoints']), 5)
+            self.assertFalse(MovieHall.objects.exists())
+
+            for result in report['endpoints'].values():
+                result['queries'] = 0
+            with open(baseline, 'w') as file:
+                json.dump(report, file)
+            with self.assertRaisesMessage(CommandError, 'SessionViewSet.list'):
+                call_command('bench_read_path', *options, '--baseline', baseline, stdout=StringIO())
+
+    @patch('api.management.commands.bench_read_path.datetime')
+    def test_seeded_sessions_do_not_overlap(self, mocked_datetime):
+        mocked_datetime.now.return_value = datetime.combine(date.today(), time(20, 0))
+        options = {
+            'sessions': 30, 'halls': 3, 'rows': 2, 'seats_per_row': 2, 'movies': 2, 'order_sessions': 1, 'orders': 1
+        }
+        sessions = BenchReadPathCommand().seed(random.Random(0), options)['sessions']
+        self.assertEqual(len(sessions), 30)
+        for session in sessions:
+            self.assertGreater(session.time_end, session.time_start)
+            self.assertFalse(Session.objects.exists_overlapping(
+                session.hall, session.session_date, session.time_start, session.time_end, session.pk
+            ))
+        options['sessions'] = 3 * 120
+        with self.assertRaisesMessage(CommandError, 'do not fit'):
+            BenchReadPathCommand().seed(random.Random(0), options)
+
+    def test_bench_read_path_rejects_disallowed_host(self):
+        with self.assertRaisesMessage(CommandError, 'ALLOWED_HOSTS'):
+            call_command('bench_read_path', '--host', 'bench.invalid', stdout=StringIO())
+        self.assertFalse(MovieHall.objects.exists())
+
+
+class TokenMiddlewareTests(APITestCase):
+    def setUp(self):
+        cache.clear()
+        self.user = UserFactory()
+        self.token = Token.objects.create(user=self.user)
+        self.client.credentials(HTTP_AUTHORIZATION=f"Token {self.token.key}")
+        self.url = reverse('user-orders', kwargs={"pk": self.user.pk})
+
+    def set_last_request(self, **delta):
+        type(self.user).objects.filter(pk=self.user.pk).update(last_request=datetime.now() - timedelta(**delta))
+
+    def get(self):
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(self.url)
+        sql = [query['sql'] for query in queries]
+        return response, sql
+
+    def test_token_is_resolved_once(self):
+        self.set_last_request(seconds=30)
+        response, sql = self.get()
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(len([query for query in sql if 'FROM "authtoken_token"' in query]), 1)
+        self.assertEqual(len([query for query in sql if query.startswith('UPDATE "core_user"')]), 1)
+
+    def test_last_request_writes_are_coalesced(self):
+        self.set_last_request(seconds=30)
+        self.get()
+        response, sql = self.get()
+        self.assertEqual(response.status_code, 200)
+        self.assertFalse([query for query in sql if query.startswith('UPDATE "core_user"')])
+
+    def test_idle_token_is_deleted(self):
+        self.set_last_request(minutes=2)
+        response, _ = self.get()
+        self.assertEqual(response.status_code, 401)
+        self.assertFalse(Token.objects.filter(pk=self.token.pk).exists())
+
+    def test_cached_last_request_keeps_token_alive(self):
+        self.set_last_request(minutes=2)
+        cache.set(last_request_key(self.user.pk), datetime.now() - timedelta(seconds=10))
+        response, _ = self.get()
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(Token.objects.filter(pk=self.token.pk).exists())
+
+    @override_settings(TOKEN_CACHE_TIMEOUT=60)
+    def test_token_is_cached_across_requests(self):
+        self.get()
+        response, sql = self.get()
+        self.assertEqual(response.status_code, 200)
+        self.assertFalse([query for query in sql if 'FROM "authtoken_token"' in query])
+
+    @override_settings(TOKEN_CACHE_TIMEOUT=60)
+    def test_cached_balance_is_read_from_the_database(self):
+        self.get()
+        type(self.user).objects.filter(pk=self.user.pk).update(money=123)
+        response = self.client.get(reverse('user-detail', kwargs={"pk": self.user.pk}))
+        self.assertEqual(response.wsgi_request.user.money, 123)
+
+    @override_settings(TOKEN_CACHE_TIMEOUT=60)
+    def test_password_hash_is_not_cached(self):
+        self.get()
+        cached = cache.get(token_cache_key(self.token.key))
+        self.assertIn('password', cached.user.get_deferred_fields())
+
+    @override_settings(TOKEN_CACHE_TIMEOUT=60)
+    def test_deleted_token_is_forgotten(self):
+        self.get()
+        self.token.delete()
+        response, _ = self.get()
+        self.assertEqual(response.json(), {"error": "Invalid Token"})
+
+    @override_settings(TOKEN_CACHE_TIMEOUT=60)
+    def test_deactivated_user_is_forgotten(self):
+        self.get()
+        self.user.is_active = False
+        self.user.save()
+        response, _ = self.get()
+        self.assertEqual(response.status_code, 401)
@@ -1,4 +1,5 @@
-from datetime import date, datetime, timedelta
+import base64
+from datetime import date, timedelta
 from rest_framework import generics
 from api.serializers import (
     UserSerializer,
@@ -8,9 +9,11 @@ from api.serializers import (
     AuthUserSerializer,
     MovieHallSerializer,
     SessionSerializer,
-    UserOrdersSerializer,
     SessionSeatSerializer,
-    SessionSeatListSerializer
+    SeatHoldSerializer,
+    SessionScheduleSerializer,
+    MovieSearchSerializer,
+    MovieDetailSerializer,
 )
 from django.core.exceptions import ImproperlyConfigured, ObjectDoesNotExist
 from rest_framework import viewsets, permissions, status, serializers
@@ -19,9 +22,18 @@ from api.custom_permissions import IsOwnerOrAdminOnly, IsStaffOnly
 from rest_framework.authtoken.models import Token
 from rest_framework.decorators import action
 from rest_framework.response import Response
-from cinema.models import MovieHall, Session, SessionSeat
+from cinema.models import Movie, MovieHall, Order, Session, SessionSeat
 from django.http import JsonResponse
+from django.shortcuts import get_object_or_404
+from api.fast_serializers import SessionFastSerializer, SessionSeatFastSerializer
 from api.filters import CustomSessionSortingFilter
+from api.pagination import OrderHistoryPagination, SessionCursorPagination
+from django.utils.http import parse_etags
+from cinema.bitmap import SeatBitmap
+from cinema.booking import book_seats, hold_seats, release_holds, BookingError
+from cinema.cache import get_cached_listing, get_movie_payloads, listing_cutoff
+from cinema.autocomplete import catalog_autocomplete
+from cinema.search import search_movies
 
 User = get_user_model()
 
@@ -41,11 +53,36 @@ class UserViewSet(viewsets.ModelViewSet):
 
         return [permission() for permission in self.permission_classes]
 
-    @action(methods=["GET"], detail=True)
+    @action(methods=["GET"], detail=True, pagination_class=OrderHistoryPagination)
     def orders(self, request, pk=None):
         user = self.get_object()
-        serializer = UserOrdersSerializer(user)
-        return Response(serializer.data)
+        orders = self.paginate_queryset(Order.objects.history(user))
+        response = self.get_paginated_response(self.group_order_seats(orders))
+        response.data["total_spent"] = str(user.total_spent)
+        return response
+
+    @staticmethod
+    def group_order_seats(orders):
+        history = {
+            order["id"]: {"id": order["id"], "purchase_price": str(order["purchase_price"]), "session": None, "seats": []}
+            for order in orders
+        }
+        for row in Order.objects.history_seats(list(history)):
+            order = history[row["order_id"]]
+            if order["session"] is None:
+                order["session"] = {
+                    "id": row["session_id"],
+                    "session_date": row["session_date"],
+                    "time_start": row["time_start"],
+                    "time_end": row["time_end"],
+                    "price": str(row["price"]),
+                    "movie": {"id": row["movie_id"], "name": row["movie_name"]},
+                    "hall": {"id": row["hall_id"], "name": row["hall_name"]},
+                }
+            order["seats"].append(
+                {"id": row["seat_id"], "row_number": row["row_number"], "seat_number": row["seat_number"]}
+            )
+        return list(history.values())
 
 
 class AuthViewSet(viewsets.GenericViewSet):
@@ -121,33 +158,84 @@ class MovieHallViewSet(viewsets.ModelViewSet):
         return Response({"message": message}, status=status.HTTP_405_METHOD_NOT_ALLOWED)
 
 
+class MovieViewSet(viewsets.ReadOnlyModelViewSet):
+    queryset = Movie.objects.all()
+    serializer_class = MovieDetailSerializer
+    permission_classes = [permissions.AllowAny]
+    lookup_value_regex = r'\d+'
+
+    def list(self, request, *args, **kwargs):
+        page = self.paginate_queryset(self.get_queryset().only('id'))
+        return self.get_paginated_response(self.get_payloads([movie.pk for movie in page]))
+
+    def retrieve(self, request, *args, **kwargs):
+        payloads = self.get_payloads([int(kwargs['pk'])])
+        if not payloads:
+            return Response({"detail": "Not found."}, status=status.HTTP_404_NOT_FOUND)
+        return Response(payloads[0])
+
+    def get_payloads(self, movie_pks):
+        # payloads are cached without the request, so image urls are made absolute per response
+        payloads = get_movie_payloads(movie_pks, self.build_payloads)
+        return [
+            {**payload, "image": self.request.build_absolute_uri(payload["image"]) if payload["image"] else None}
+            for payload in payloads
+        ]
+
+    @staticmethod
+    def build_payloads(movie_pks):
+        movies = Movie.objects.filter(pk__in=movie_pks).prefetch_related('genres', 'actors', 'directors')
+        return {movie.pk: MovieDetailSerializer(movie).data for movie in movies}
+
+
 class SessionViewSet(viewsets.ModelViewSet):
     queryset = Session.objects.all()
     serializer_class = SessionSerializer
     filter_backends = [CustomSessionSortingFilter]
+    pagination_class = SessionCursorPagination
     ordering_fields = ['price', '-price', "time_start", "-time_start"]
 
-    def ordering(self, queryset):
-        ordering = self.request.query_params.get('ordering')
-        if ordering in self.ordering_fields:
-            queryset = queryset.order_by(ordering)
-        return queryset
+    def get_cutoff(self):
+        if not hasattr(self, 'cutoff'):
+            self.cutoff = listing_cutoff()
+        return self.cutoff
 
     def get_queryset(self):
-        queryset = super().get_queryset()
-        queryset = queryset.filter(
+        queryset = super().get_queryset().defer("occupancy")
+        return queryset.filter(
             session_date=date.today(),
-            time_start__gte=datetime.now().time()
+            time_start__gte=self.get_cutoff()
+        )
+
+    def list(self, request, *args, **kwargs):
+        data = get_cached_listing(
+            request, "api-today", date.today(),
+            lambda: self.get_listing_data(self.filter_queryset(self.get_queryset())),
+            self.get_cutoff()
         )
-        return self.ordering(queryset)
+        return Response(data)
 
     @action(methods=["GET"], detail=False)
     def tomorrow(self, request):
         tomorrow = date.today() + timedelta(days=1)
-        queryset = self.queryset.filter(session_date=tomorrow)
-        queryset = self.ordering(queryset)
-        serializer = self.get_serializer(queryset, many=True)
-        return Response(serializer.data)
+        data = get_cached_listing(
+            request, "api-tomorrow", tomorrow,
+            lambda: self.get_listing_data(self.queryset.filter(session_date=tomorrow))
+        )
+        return Response(data)
+
+    def get_listing_data(self, queryset):
+        serializer = SessionFastSerializer(self.request)
+        page = self.paginate_queryset(queryset.values(*serializer.fields))
+        return self.get_paginated_response(serializer.serialize(page)).data
+
+    @action(methods=["POST"], detail=False, serializer_class=SessionScheduleSerializer)
+    def schedule(self, request):
+        serializer = self.get_serializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        sessions = serializer.save()
+        data = SessionSerializer(sessions, many=True, context=self.get_serializer_context()).data
+        return Response(data, status=status.HTTP_201_CREATED)
 
     def update(self, request, *args, **kwargs):
         instance = self.get_object()
@@ -175,51 +263,130 @@ class SessionSeatDetail(generics.RetrieveUpdateAPIView):
     permission_classes = [permissions.IsAuthenticated]
 
     def get(self, request, *args, **kwargs):
-        session_pk = self.kwargs.get('session_pk')
-        session_seats = self.queryset.filter(session_id=session_pk, is_booked=False)
-        serializer = self.get_serializer(session_seats, many=True)
-        return Response(serializer.data)
+        session = self.session
+        serializer = SessionSeatFastSerializer()
+        if session.lazy_seats:
+            # lazy sessions page through hall seats, seats sold on a page are dropped from it
+            page = self.paginate_queryset(session.get_hall_seats(request.user))
+            rows = [
+                {"id": None, "session_id": session.pk, "seat_id": session_seat.seat_id, "is_booked": False}
+                for session_seat in session.to_free_session_seats(page)
+            ]
+        else:
+            rows = self.paginate_queryset(session.get_free_session_seats(request.user).values(*serializer.fields))
+        return self.get_paginated_response(serializer.serialize(rows))
 
     def put(self, request, *args, **kwargs):
-        session_pk = self.kwargs.get('session_pk')
-        session_seats = self.queryset.filter(session_id=session_pk, is_booked=False)
-        serializer = self.get_serializer(session_seats, data=request.data, many=True)
-        if self.is_booked(validated_data=serializer.initial_data) is False:
-            if self.is_buying(user=request.user, data=serializer.initial_data) is False:
-                return Response(data={"error": "you have not enough money"})
-            else:
-                serializer.is_valid(raise_exception=True)
-                serializer.save()
-                return Response(serializer.data)
-        else:
+        session = self.session
+        try:
+            seat_ids = [int(data["seat"]) for data in request.data]
+        except (TypeError, KeyError, ValueError):
             return Response(data={"error": "Seats that you chose already have chosen or dont exist"})
 
-    def is_buying(self, user, data):
-        count_seats = len(data)
+        if self.is_buying(user=request.user, session=session, seat_ids=seat_ids) is False:
+            return Response(data={"error": "you have not enough money"})
         try:
-            session = Session.objects.get(pk=data[0]["session"])
-            session_price = session.price
-            return count_seats * session_price <= user.money
-        except Exception as e:
-            return Response(data={"error": "error"})
-
-    def is_booked(self, validated_data):
-        for data in validated_data:
-            try:
-                session_seat = SessionSeat.objects.get(pk=data["id"], is_booked=False)
-            except Exception as e:
-                return True
-        return False
+            order = book_seats(request.user, session, seat_ids)
+        except BookingError as error:
+            return Response(data={"error": str(error)})
+        serializer = self.get_serializer(order.session_seats.all(), many=True)
+        return Response(serializer.data)
+
+    def is_buying(self, user, session, seat_ids):
+        return len(seat_ids) * session.price <= user.money
 
     def dispatch(self, request, *args, **kwargs):
         session_pk = self.kwargs.get('session_pk')
         try:
-            session = Session.objects.get(pk=session_pk)
+            session = self.session = Session.objects.get(pk=session_pk)
             if session.date_check():
                 return JsonResponse({"error": "This session is unavailable"}, status=400)
-            if session.get_available_seats == 0:
+            if session.available_seats == 0:
                 return JsonResponse({"error": "Seats on that session are sold"}, status=400)
         except ObjectDoesNotExist as e:
             return JsonResponse({"error": "No session"}, status=400)
 
         return super().dispatch(request, *args, **kwargs)
+
+
+class SeatHoldView(generics.GenericAPIView):
+    serializer_class = SeatHoldSerializer
+    permission_classes = [permissions.IsAuthenticated]
+
+    def post(self, request, *args, **kwargs):
+        session = get_object_or_404(Session, pk=self.kwargs.get('session_pk'))
+        serializer = self.get_serializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        seats = serializer.validated_data['seats']
+        try:
+            expires_at = hold_seats(request.user, session, seats)
+        except BookingError as error:
+            return Response(data={"error": str(error)}, status=status.HTTP_409_CONFLICT)
+        return Response(data={"seats": seats, "expires_at": expires_at}, status=status.HTTP_201_CREATED)
+
+    def delete(self, request, *args, **kwargs):
+        session = get_object_or_404(Session, pk=self.kwargs.get('session_pk'))
+        serializer = self.get_serializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        release_holds(request.user, session, serializer.validated_data['seats'])
+        return Response(status=status.HTTP_204_NO_CONTENT)
+
+
+class SessionSeatMapView(generics.GenericAPIView):
+    queryset = Session.objects.all()
+    permission_classes = [permissions.IsAuthenticated]
+
+    def get(self, request, *args, **kwargs):
+        session_pk = self.kwargs.get('session_pk')
+        state = Session.objects.seat_map_state(session_pk, request.user)
+        if state is None:
+            return Response(data={"error": "No session"}, status=status.HTTP_404_NOT_FOUND)
+
+        etag = self.get_etag(session_pk, state, request.user)
+        if etag in parse_etags(request.headers.get('If-None-Match', '')):
+            return self.with_etag(Response(status=status.HTTP_304_NOT_MODIFIED), etag)
+
+        seat_map = Session.objects.seat_map(session_pk, request.user)
+        size = (seat_map['rows'] * seat_map['seats_per_row'] + 7) // 8
+        held = SeatBitmap()
+        for index in seat_map['held']:
+            held.set(index)
+        data = {
+            "session": int(session_pk),
+            "rows": seat_map['rows'],
+            "seats_per_row": seat_map['seats_per_row'],
+            "booked": base64.b64encode(SeatBitmap(seat_map['occupancy']).to_bytes(size)).decode(),
+            "held": base64.b64encode(held.to_bytes(size)).decode(),
+        }
+        return self.with_etag(Response(data), self.get_etag(session_pk, seat_map, request.user))
+
+    @staticmethod
+    def get_etag(session_pk, state, user):
+        expire_at = state['holds_expire_at']
+        expiry = int(expire_at.timestamp()) if expire_at else 0
+        return f'"{session_pk}-{state["seats_version"]}-{user.pk}-{expiry}"'
+
+    @staticmethod
+    def with_etag(response, etag):
+        response['ETag'] = etag
+        response['Cache-Control'] = 'private, no-cache'
+        return response
+
+
+class MovieSearchView(generics.ListAPIView):
+    serializer_class = MovieSearchSerializer
+    permission_classes = [permissions.AllowAny]
+    pagination_class = None
+
+    def get_queryset(self):
+        query = self.request.query_params.get('q', '').strip()
+        if not query:
+            return Movie.objects.none()
+        return search_movies(query)
+
+
+class AutocompleteView(generics.GenericAPIView):
+    permission_classes = [permissions.AllowAny]
+
+    def get(self, request, *args, **kwargs):
+        return Response(catalog_autocomplete.search(request.query_params.get('q', '')))
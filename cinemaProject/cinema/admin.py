@@ -1,5 +1,6 @@
 from django.contrib import admin
 from cinema import models
+from cinema.booking import cancel_order
 
 
 class MovieGenreInline(admin.TabularInline):
@@ -22,6 +23,32 @@ class MovieAdmin(admin.ModelAdmin):
     inlines = [MovieGenreInline, MovieActorInline, MovieDirectorInline]
 
 
+@admin.register(models.Order)
+class OrderAdmin(admin.ModelAdmin):
+    list_filter = ["is_cancelled"]
+    actions = ["cancel_orders"]
+
+    @admin.action(description="Cancel selected orders and release their seats")
+    def cancel_orders(self, request, queryset):
+        for order in queryset:
+            cancel_order(order)
+
+
+@admin.register(models.WalletEntry)
+class WalletEntryAdmin(admin.ModelAdmin):
+    list_display = ["user", "kind", "amount", "order", "created_at"]
+    readonly_fields = ["user", "order", "kind", "amount", "created_at"]
+
+    def has_add_permission(self, request):
+        return False
+
+    def has_change_permission(self, request, obj=None):
+        return False
+
+    def has_delete_permission(self, request, obj=None):
+        return False
+
+
 admin.site.register(models.Director)
 admin.site.register(models.Actor)
 admin.site.register(models.Genre)
@@ -31,5 +58,4 @@ admin.site.register(models.MovieActor)
 admin.site.register(models.MovieHall)
 admin.site.register(models.Seat)
 admin.site.register(models.Session)
-admin.site.register(models.Order)
 admin.site.register(models.SessionSeat)
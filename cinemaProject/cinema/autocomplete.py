@@ -0,0 +1,141 @@
+import heapq
+import threading
+import time
+from .models import Actor, Director, Movie
+
+AUTOCOMPLETE_LIMIT = 10
+# other workers only see changes made in this process after a rebuild
+AUTOCOMPLETE_REBUILD_INTERVAL = 5 * 60
+
+
+def normalize(text):
+    return " ".join(text.lower().split())
+
+
+class TrieNode:
+    __slots__ = ("children", "keys", "top")
+
+    def __init__(self):
+        self.children = {}
+        self.keys = set()
+        self.top = None
+
+
+class PrefixIndex:
+    def __init__(self, limit=AUTOCOMPLETE_LIMIT):
+        self.limit = limit
+        self.root = TrieNode()
+        self.entries = {}
+        self.lock = threading.Lock()
+
+    @staticmethod
+    def get_terms(label):
+        words = normalize(label).split(" ")
+        return {" ".join(words[start:]) for start in range(len(words))}
+
+    def rank(self, key):
+        label, score = self.entries[key]
+        return -score, label.lower(), key
+
+    def add(self, key, label, score=0):
+        with self.lock:
+            self._remove(key)
+            self.entries[key] = (label, score)
+            for term in self.get_terms(label):
+                node = self.root
+                node.keys.add(key)
+                node.top = None
+                for char in term:
+                    node = node.children.setdefault(char, TrieNode())
+                    node.keys.add(key)
+                    node.top = None
+
+    def remove(self, key):
+        with self.lock:
+            self._remove(key)
+
+    def _remove(self, key):
+        if key not in self.entries:
+            return
+        label, _ = self.entries.pop(key)
+        self.root.keys.discard(key)
+        self.root.top = None
+        for term in self.get_terms(label):
+            parent = self.root
+            for char in term:
+                node = parent.children.get(char)
+                if node is None:
+                    break
+                node.keys.discard(key)
+                node.top = None
+                if not node.keys:
+                    del parent.children[char]
+                    break
+                parent = node
+
+    def search(self, prefix):
+        node = self.root
+        for char in normalize(prefix):
+            node = node.children.get(char)
+            if node is None:
+                return []
+        top = node.top
+        if top is None:
+            with self.lock:
+                top = node.top = heapq.nsmallest(self.limit, node.keys, key=self.rank)
+        # a concurrent remove may drop keys of a cached top
+        return [(key, entry[0]) for key in top if (entry := self.entries.get(key)) is not None]
+
+
+class CatalogAutocomplete:
+    sources = (
+        ("movie", Movie, ("name", "rating"), lambda name, rating: (name, rating)),
+        ("actor", Actor, ("name", "surname"), lambda name, surname: (f"{name} {surname}", 0)),
+        ("director", Director, ("name", "surname"), lambda name, surname: (f"{name} {surname}", 0)),
+    )
+
+    def __init__(self):
+        self.index = None
+        self.built_at = 0
+        self.rebuild_lock = threading.Lock()
+
+    def get_index(self):
+        index = self.index
+        if index is None or time.monotonic() - self.built_at > AUTOCOMPLETE_REBUILD_INTERVAL:
+            # one request rebuilds, the others keep serving the current index unless there is none yet
+            if self.rebuild_lock.acquire(blocking=index is None):
+                try:
+                    if self.index is index:
+                        self.rebuild()
+                finally:
+                    self.rebuild_lock.release()
+        return self.index
+
+    def rebuild(self):
+        index = PrefixIndex()
+        for kind, model, fields, describe in self.sources:
+            for pk, *values in model.objects.values_list("pk", *fields).iterator():
+                index.add((kind, pk), *describe(*values))
+        self.index, self.built_at = index, time.monotonic()
+
+    def update(self, instance):
+        if self.index is None:
+            return
+        for kind, model, fields, describe in self.sources:
+            if isinstance(instance, model):
+                self.index.add((kind, instance.pk), *describe(*(getattr(instance, field) for field in fields)))
+
+    def remove(self, instance):
+        if self.index is None:
+            return
+        for kind, model, fields, describe in self.sources:
+            if isinstance(instance, model):
+                self.index.remove((kind, instance.pk))
+
+    def search(self, prefix):
+        if not normalize(prefix):
+            return []
+        return [{"kind": kind, "id": pk, "label": label} for (kind, pk), label in self.get_index().search(prefix)]
+
+
+catalog_autocomplete = CatalogAutocomplete()
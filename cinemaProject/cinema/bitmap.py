@@ -0,0 +1,45 @@
+class SeatBitmap:
+    def __init__(self, data=b""):
+        self.data = bytearray(data or b"")
+
+    def __bytes__(self):
+        return bytes(self.data)
+
+    def to_bytes(self, size):
+        return bytes(self.data[:size]).ljust(size, b"\0")
+
+    def __len__(self):
+        return len(self.data) * 8
+
+    @staticmethod
+    def index(row_number, seat_number, seats_per_row):
+        return (row_number - 1) * seats_per_row + (seat_number - 1)
+
+    def is_set(self, index):
+        byte, bit = divmod(index, 8)
+        return byte < len(self.data) and bool(self.data[byte] & (1 << bit))
+
+    def set(self, index):
+        byte, bit = divmod(index, 8)
+        if byte >= len(self.data):
+            self.data.extend(bytes(byte + 1 - len(self.data)))
+        self.data[byte] |= 1 << bit
+
+    def clear(self, index):
+        byte, bit = divmod(index, 8)
+        if byte < len(self.data):
+            self.data[byte] &= ~(1 << bit) & 0xFF
+
+    def count(self):
+        return int.from_bytes(self.data, "little").bit_count()
+
+    def claim(self, indexes):
+        taken = [index for index in indexes if self.is_set(index)]
+        if not taken:
+            for index in indexes:
+                self.set(index)
+        return taken
+
+    def release(self, indexes):
+        for index in indexes:
+            self.clear(index)
@@ -0,0 +1,142 @@
+from collections import defaultdict
+from datetime import datetime
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Sum
+from .bitmap import SeatBitmap
+from .cache import bump_listing_version
+from .models import Order, Seat, SeatHold, Session, SessionSeat, WalletEntry
+
+
+class BookingError(Exception):
+    pass
+
+
+class NotEnoughMoney(BookingError):
+    def __init__(self):
+        super().__init__("You have not enough money")
+
+
+class SeatsUnavailable(BookingError):
+    def __init__(self, seats):
+        self.seats = seats
+        super().__init__("Seats that you chose already have chosen or dont exist")
+
+
+def parse_seat_ids(seat_ids):
+    try:
+        seat_ids = {int(seat_id) for seat_id in seat_ids}
+    except (TypeError, ValueError):
+        raise BookingError("Seats that you chose already have chosen or dont exist")
+    if not seat_ids:
+        raise BookingError("Choose at least one seat")
+    return seat_ids
+
+
+def book_seats(user, session, seat_ids):
+    seat_ids = parse_seat_ids(seat_ids)
+
+    # seats are claimed by conditional updates, so the whole order is booked or rolled back
+    with transaction.atomic():
+        order = Order.objects.create(user=user, purchase_price=session.price)
+        if session.lazy_seats:
+            claimed = _claim_hall_seats(user, session, seat_ids)
+        else:
+            claimed = _claim_session_seats(user, session, seat_ids, order)
+
+        indexes = {seat_id: SeatBitmap.index(row, seat, per_row) for seat_id, row, seat, per_row in claimed}
+        taken = Session.objects.claim_seats(session.pk, list(indexes.values()))
+        if taken:
+            raise SeatsUnavailable(_get_seats(session, [seat_id for seat_id, index in indexes.items() if index in taken]))
+        if session.lazy_seats:
+            SessionSeat.objects.bulk_create(
+                [SessionSeat(session=session, seat_id=seat_id, order=order, is_booked=True) for seat_id in indexes]
+            )
+
+        SeatHold.objects.filter(session=session, seat_id__in=seat_ids).delete()
+        total = session.price * len(indexes)
+        if not user.debit(total):
+            raise NotEnoughMoney()
+        WalletEntry.objects.create(user=user, order=order, kind=WalletEntry.PURCHASE, amount=-total)
+        bump_listing_version(session.session_date)
+    return order
+
+
+def _claim_session_seats(user, session, seat_ids, order):
+    booked = session.session_seats.filter(seat_id__in=seat_ids, is_booked=False).exclude(
+        seat__in=session.get_held_seats(user)
+    ).update(order=order, is_booked=True)
+    claimed = list(SessionSeat.objects.filter(order=order).values_list(
+        "seat_id", "seat__row_number", "seat__seat_number", "seat__hall__seats_per_row"
+    ))
+    if booked != len(seat_ids):
+        raise SeatsUnavailable(_get_seats(session, seat_ids - {seat_id for seat_id, *_ in claimed}))
+    return claimed
+
+
+def _claim_hall_seats(user, session, seat_ids):
+    seats = list(Seat.objects.filter(hall_id=session.hall_id, pk__in=seat_ids).exclude(
+        pk__in=session.get_held_seats(user)
+    ).values_list("pk", "row_number", "seat_number", "hall__seats_per_row"))
+    if len(seats) != len(seat_ids):
+        raise SeatsUnavailable(_get_seats(session, seat_ids - {seat_id for seat_id, *_ in seats}))
+    return seats
+
+
+def _get_seats(session, seat_ids):
+    return list(Seat.objects.filter(pk__in=seat_ids, hall_id=session.hall_id).order_by("pk"))
+
+
+def hold_seats(user, session, seat_ids):
+    seat_ids = parse_seat_ids(seat_ids)
+
+    now = datetime.now()
+    expires_at = now + settings.SEAT_HOLD_LIFETIME
+    with transaction.atomic():
+        SeatHold.objects.filter(session=session, seat_id__in=seat_ids, expires_at__lte=now).delete()
+        free_seats = session.get_free_seat_ids(seat_ids, user)
+        SeatHold.objects.bulk_create(
+            [SeatHold(session=session, seat_id=seat_id, user=user, expires_at=expires_at) for seat_id in free_seats],
+            ignore_conflicts=True
+        )
+        held = SeatHold.objects.filter(session=session, seat_id__in=seat_ids, user=user).update(expires_at=expires_at)
+        if held != len(seat_ids):
+            held_ids = SeatHold.objects.filter(session=session, seat_id__in=seat_ids, user=user).values_list(
+                "seat_id", flat=True
+            )
+            raise SeatsUnavailable(_get_seats(session, seat_ids - set(held_ids)))
+        Session.objects.bump_seats_version(session.pk)
+    return expires_at
+
+
+def release_holds(user, session, seat_ids):
+    seat_ids = parse_seat_ids(seat_ids)
+    released, _ = SeatHold.objects.filter(session=session, seat_id__in=seat_ids, user=user).delete()
+    if released:
+        Session.objects.bump_seats_version(session.pk)
+
+
+def cancel_order(order):
+    with transaction.atomic():
+        # the conditional update makes a second cancel of the same order a no-op
+        if not Order.objects.filter(pk=order.pk, is_cancelled=False).update(is_cancelled=True):
+            return
+        order.is_cancelled = True
+        booked = order.session_seats.values_list(
+            'session', 'session__session_date', 'seat__row_number', 'seat__seat_number', 'seat__hall__seats_per_row'
+        )
+        indexes = defaultdict(list)
+        days = set()
+        for session_id, session_date, row, seat, per_row in booked:
+            indexes[session_id].append(SeatBitmap.index(row, seat, per_row))
+            days.add(session_date)
+        for session_id, session_indexes in indexes.items():
+            Session.objects.release_seats(session_id, session_indexes)
+        order.session_seats.filter(session__lazy_seats=True).delete()
+        order.session_seats.update(order=None, is_booked=False)
+        # refund what was debited, the session price may have changed since
+        debited = order.wallet_entries.filter(kind=WalletEntry.PURCHASE).aggregate(total=Sum('amount'))['total']
+        if debited:
+            order.user.credit(-debited)
+            WalletEntry.objects.create(user_id=order.user_id, order=order, kind=WalletEntry.REFUND, amount=-debited)
+        bump_listing_version(*days)
@@ -0,0 +1,106 @@
+import hashlib
+import time
+from datetime import datetime
+from urllib.parse import urlencode
+from django.contrib.messages import get_messages
+from django.core.cache import cache
+from django.db import transaction
+from django.http import HttpResponse
+
+LISTING_CACHE_TIMEOUT = 5 * 60
+MOVIE_PAYLOAD_TIMEOUT = 60 * 60
+
+
+def _version_key(day):
+    return f"sessions:version:{day.isoformat()}"
+
+
+def get_listing_version(day):
+    key = _version_key(day)
+    version = cache.get(key)
+    if version is None:
+        # a fresh version must not collide with entries cached before the counter was evicted
+        cache.add(key, time.time_ns(), None)
+        version = cache.get(key)
+    return version
+
+
+def _bump(key):
+    try:
+        cache.incr(key)
+    except ValueError:
+        cache.set(key, time.time_ns(), None)
+
+
+def bump_listing_version(*days):
+    for key in {_version_key(day) for day in days}:
+        _bump(key)
+        # bump again after commit, a listing cached while the transaction was open is stale
+        transaction.on_commit(lambda key=key: _bump(key))
+
+
+def movie_payload_key(movie_pk):
+    return f"movies:payload:{movie_pk}"
+
+
+def invalidate_movie_payloads(movie_pks):
+    keys = [movie_payload_key(pk) for pk in movie_pks]
+    cache.delete_many(keys)
+    transaction.on_commit(lambda: cache.delete_many(keys))
+
+
+def get_movie_payloads(movie_pks, build):
+    payloads = cache.get_many([movie_payload_key(pk) for pk in movie_pks])
+    payloads = {pk: payloads[movie_payload_key(pk)] for pk in movie_pks if movie_payload_key(pk) in payloads}
+    missing = [pk for pk in movie_pks if pk not in payloads]
+    if missing:
+        built = build(missing)
+        cache.set_many({movie_payload_key(pk): payload for pk, payload in built.items()}, MOVIE_PAYLOAD_TIMEOUT)
+        payloads.update(built)
+    return [payloads[pk] for pk in movie_pks if pk in payloads]
+
+
+def listing_cutoff():
+    return datetime.now().replace(second=0, microsecond=0).time()
+
+
+def listing_cache_key(request, name, day, cutoff=None):
+    params = hashlib.md5(urlencode(sorted(request.GET.lists()), doseq=True).encode()).hexdigest()
+    return f"sessions:{name}:{request.get_host()}:{day.isoformat()}:{get_listing_version(day)}:{cutoff}:{params}"
+
+
+def get_cached_listing(request, name, day, build, cutoff=None):
+    key = listing_cache_key(request, name, day, cutoff)
+    data = cache.get(key)
+    if data is None:
+        data = build()
+        if data is not None:
+            cache.set(key, data, LISTING_CACHE_TIMEOUT)
+    return data
+
+
+class CachedListingMixin:
+    listing_name = None
+
+    def get_listing_day(self):
+        raise NotImplementedError
+
+    def get_listing_cutoff(self):
+        return None
+
+    def get(self, request, *args, **kwargs):
+        if request.user.is_authenticated or len(get_messages(request)):
+            return super().get(request, *args, **kwargs)
+
+        def build():
+            response = super(CachedListingMixin, self).get(request, *args, **kwargs)
+            if response.status_code != 200:
+                return None
+            return response.render().content
+
+        content = get_cached_listing(
+            request, self.listing_name, self.get_listing_day(), build, self.get_listing_cutoff()
+        )
+        if content is None:
+            return super().get(request, *args, **kwargs)
+        return HttpResponse(content)
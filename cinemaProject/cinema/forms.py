@@ -135,8 +135,7 @@ class SessionFormBase(forms.ModelForm):
 
     def clean_session_time(self, time_start, time_end, session_date, hall, session_pk=None):
         if isinstance(time_start, time) and isinstance(time_end, time):
-            if (Session.objects.exists_session_by_time(time_end, session_date, hall, session_pk)
-                    or Session.objects.exists_session_by_time(time_start, session_date, hall, session_pk)):
+            if Session.objects.exists_overlapping(hall, session_date, time_start, time_end, session_pk):
                 raise forms.ValidationError(
                     self.error_messages['invalid_session'],
                     code='invalid_session'
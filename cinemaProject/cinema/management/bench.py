@@ -0,0 +1,21 @@
+from contextlib import contextmanager
+from django.db import connection
+
+
+@contextmanager
+def bench_database():
+    # the seeded rows and the bookings, ledger entries included, live in a throwaway test database
+    # that is dropped afterwards; worker threads use their own connections, so a rollback would not do
+    old_name = connection.settings_dict["NAME"]
+    # a name of its own, so a benchmark can run next to (or from within) the test database
+    test_settings = connection.settings_dict["TEST"]
+    test_name = test_settings["NAME"]
+    test_settings["NAME"] = f"bench_{old_name}"
+    try:
+        connection.creation.create_test_db(verbosity=0, autoclobber=True, serialize=False)
+    finally:
+        test_settings["NAME"] = test_name
+    try:
+        yield
+    finally:
+        connection.creation.destroy_test_db(old_name, verbosity=0)
@@ -0,0 +1,199 @@
+import json
+import random
+import threading
+import time
+import uuid
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, time as dt_time
+from django.contrib import messages
+from django.contrib.auth import get_user_model
+from django.contrib.messages.storage.cookie import CookieStorage
+from django.core.management.base import BaseCommand
+from django.db import connection
+from django.db.models import Count
+from django.test import RequestFactory
+from rest_framework.test import APIRequestFactory, force_authenticate
+from api.views import SessionSeatDetail
+from cinema.bitmap import SeatBitmap
+from cinema.factories import MovieHallFactory, SessionTodayFactory, UserFactory
+from cinema.management.bench import bench_database
+from cinema.models import Seat, SessionSeat
+from cinema.utils import create_order
+
+User = get_user_model()
+
+LOCK_WAITS_SQL = """
+SELECT count(*) FROM pg_stat_activity
+WHERE datname = current_database() AND wait_event_type = 'Lock'
+"""
+
+
+def percentile(values, percent):
+    if not values:
+        return None
+    values = sorted(values)
+    return values[min(len(values) - 1, int(len(values) * percent / 100))]
+
+
+class LockWaitMonitor(threading.Thread):
+    interval = 0.01
+
+    def __init__(self):
+        super().__init__(daemon=True)
+        self.stopped = threading.Event()
+        self.samples = 0
+        self.waiting_samples = 0
+        self.max_waiting = 0
+
+    def run(self):
+        try:
+            with connection.cursor() as cursor:
+                while not self.stopped.wait(self.interval):
+                    cursor.execute(LOCK_WAITS_SQL)
+                    waiting = cursor.fetchone()[0]
+                    self.samples += 1
+                    self.waiting_samples += bool(waiting)
+                    self.max_waiting = max(self.max_waiting, waiting)
+        finally:
+            connection.close()
+
+    def stop(self):
+        self.stopped.set()
+        self.join()
+        return {"samples": self.samples, "waiting_samples": self.waiting_samples, "max_waiting": self.max_waiting}
+
+
+class Command(BaseCommand):
+    help = "Fires concurrent bookings at one session and reports throughput, latency and double booked seats as JSON"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--target", choices=("view", "api"), default="api")
+        parser.add_argument("--users", type=int, default=200)
+        parser.add_argument("--workers", type=int, default=16)
+        parser.add_argument("--attempts", type=int, default=1, help="bookings per user")
+        parser.add_argument("--seats", type=int, default=2, help="seats per booking")
+        parser.add_argument("--rows", type=int, default=10)
+        parser.add_argument("--seats-per-row", type=int, default=20)
+        parser.add_argument("--seed", type=int, default=0)
+        parser.add_argument("--output", help="write the JSON report to this file instead of stdout")
+
+    def handle(self, *args, **options):
+        with bench_database():
+            report = self.run(options)
+
+        data = json.dumps(report, indent=2)
+        if options["output"]:
+            with open(options["output"], "w") as output:
+                output.write(data + "\n")
+            self.stdout.write(
+                f"{report['bookings']} bookings, {report['bookings_per_second']:.1f}/s, "
+                f"p50 {report['latency_ms']['p50']}ms, p99 {report['latency_ms']['p99']}ms, "
+                f"double booked {len(report['double_booked_seats'])}"
+            )
+        else:
+            self.stdout.write(data)
+
+    def run(self, options):
+        session, users = self.setup(options)
+        try:
+            return self.book_concurrently(session, users, options)
+        finally:
+            session.movie.image.delete(save=False)
+
+    def book_concurrently(self, session, users, options):
+        rng = random.Random(options["seed"])
+        seat_ids = list(Seat.objects.filter(hall_id=session.hall_id).order_by("pk").values_list("pk", flat=True))
+        tasks = [
+            (user, [rng.sample(seat_ids, options["seats"]) for _ in range(options["attempts"])]) for user in users
+        ]
+        book = self.book_through_api if options["target"] == "api" else self.book_through_view
+
+        monitor = LockWaitMonitor() if connection.vendor == "postgresql" else None
+        if monitor:
+            monitor.start()
+        started = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=options["workers"]) as executor:
+            results = [result for results in executor.map(lambda task: self.run_task(book, session, *task), tasks)
+                       for result in results]
+        elapsed = time.perf_counter() - started
+        lock_waits = monitor.stop() if monitor else None
+
+        return self.report(session, options, results, elapsed, lock_waits)
+
+    def setup(self, options):
+        hall = MovieHallFactory(rows=options["rows"], seats_per_row=options["seats_per_row"])
+        hall.create_seats_for_hall()
+        session = SessionTodayFactory(hall=hall, price=10, time_start=dt_time(23, 59), time_end=dt_time(23, 59))
+        session.create_session_seats()
+        run = uuid.uuid4().hex[:8]
+        users = [UserFactory(username=f"bench-{run}-{number}") for number in range(options["users"])]
+        User.objects.filter(pk__in=[user.pk for user in users]).update(money=10 ** 6)
+        for user in users:
+            user.money = 10 ** 6
+        return session, users
+
+    @staticmethod
+    def run_task(book, session, user, attempts):
+        results = []
+        try:
+            for seat_ids in attempts:
+                started = time.perf_counter()
+                booked = book(session, user, seat_ids)
+                results.append((booked, seat_ids, time.perf_counter() - started))
+        finally:
+            connection.close()
+        return results
+
+    @staticmethod
+    def book_through_view(session, user, seat_ids):
+        request = RequestFactory().post(f"/session/{session.pk}/", {"seats": seat_ids})
+        request.user = user
+        request._messages = CookieStorage(request)
+        create_order(request, seat_ids, session)
+        return any(message.level == messages.SUCCESS for message in request._messages)
+
+    @staticmethod
+    def book_through_api(session, user, seat_ids):
+        request = APIRequestFactory().put(
+            f"/api/sessions/{session.pk}/session-seats/", [{"seat": seat_id} for seat_id in seat_ids], format="json"
+        )
+        force_authenticate(request, user=user)
+        response = SessionSeatDetail.as_view()(request, session_pk=session.pk)
+        return response.status_code == 200 and isinstance(getattr(response, "data", None), list)
+
+    @staticmethod
+    def report(session, options, results, elapsed, lock_waits):
+        claimed = Counter(seat_id for booked, seat_ids, _ in results if booked for seat_id in seat_ids)
+        duplicated = SessionSeat.objects.filter(session=session, is_booked=True).values("seat_id").annotate(
+            bookings=Count("pk")
+        ).filter(bookings__gt=1).values_list("seat_id", flat=True)
+        session.refresh_from_db()
+        booked_rows = SessionSeat.objects.filter(session=session, is_booked=True).count()
+        latencies = [latency * 1000 for _, _, latency in results]
+        bookings = sum(booked for booked, _, _ in results)
+        return {
+            "started_at": datetime.now().isoformat(timespec="seconds"),
+            "database": connection.vendor,
+            "seats_mode": "lazy" if session.lazy_seats else "eager",
+            "options": {key: options[key] for key in (
+                "target", "users", "workers", "attempts", "seats", "rows", "seats_per_row", "seed"
+            )},
+            "attempts": len(results),
+            "bookings": bookings,
+            "rejected": len(results) - bookings,
+            "seconds": round(elapsed, 3),
+            "bookings_per_second": bookings / elapsed if elapsed else 0,
+            "latency_ms": {
+                "p50": round(percentile(latencies, 50), 2) if latencies else None,
+                "p99": round(percentile(latencies, 99), 2) if latencies else None,
+                "max": round(max(latencies), 2) if latencies else None,
+            },
+            "lock_waits": lock_waits,
+            "double_booked_seats": sorted(
+                {seat_id for seat_id, count in claimed.items() if count > 1} | set(duplicated)
+            ),
+            "booked_seats": sum(claimed.values()),
+            "booked_rows": booked_rows,
+            "occupancy_bits": SeatBitmap(session.occupancy).count(),
+        }
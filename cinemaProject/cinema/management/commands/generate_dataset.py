@@ -0,0 +1,249 @@
+import io
+import random
+import time
+from collections import defaultdict
+from datetime import date, time as dt_time, timedelta
+from decimal import Decimal
+from itertools import islice
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.contrib.auth.hashers import make_password
+from django.core.management.base import BaseCommand
+from django.db import connection, transaction
+from faker import Faker
+from cinema.bitmap import SeatBitmap
+from cinema.cache import bump_listing_version
+from cinema.models import (
+    Actor, Director, Genre, Movie, MovieActor, MovieDirector, MovieGenre, MovieHall, Order, Seat, Session, SessionSeat,
+    WalletEntry
+)
+from cinema.search import update_search_vectors
+
+User = get_user_model()
+
+DAY_START = 9 * 60
+DAY_END = 23 * 60 + 59
+BREAK_MINUTES = 15
+
+
+class Command(BaseCommand):
+    help = "Generates a large deterministic dataset with batched bulk_create, from movies and halls down to orders"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--seed", type=int, default=0)
+        parser.add_argument("--chunk-size", type=int, default=5000)
+        parser.add_argument("--movies", type=int, default=200)
+        parser.add_argument("--actors", type=int, default=500)
+        parser.add_argument("--directors", type=int, default=100)
+        parser.add_argument("--genres", type=int, default=20)
+        parser.add_argument("--cast-size", type=int, default=5, help="actors per movie")
+        parser.add_argument("--halls", type=int, default=20)
+        parser.add_argument("--rows", type=int, default=50)
+        parser.add_argument("--seats-per-row", type=int, default=60)
+        parser.add_argument("--days", type=int, default=7, help="days with sessions, starting today")
+        parser.add_argument("--sessions-per-day", type=int, default=100)
+        parser.add_argument("--users", type=int, default=1000)
+        parser.add_argument("--orders", type=int, default=10000)
+        parser.add_argument("--max-seats-per-order", type=int, default=4)
+        parser.add_argument(
+            "--lazy", action="store_true", default=settings.SESSION_SEATS_MODE == "lazy",
+            help="create session seats for booked seats only"
+        )
+
+    def handle(self, *args, **options):
+        self.chunk_size = options["chunk_size"]
+        self.rng = random.Random(options["seed"])
+        self.fake = Faker()
+        self.fake.seed_instance(options["seed"])
+        self.started = time.perf_counter()
+        self.rows = 0
+
+        with transaction.atomic():
+            movies = self.create_catalog(options)
+            halls = self.create_halls(options)
+            sessions = self.create_sessions(options, movies, halls)
+            self.create_orders(options, sessions, halls)
+        update_search_vectors([movie.pk for movie in movies])
+        bump_listing_version(*{session.session_date for session in sessions})
+
+        elapsed = time.perf_counter() - self.started
+        self.stdout.write(self.style.SUCCESS(
+            f"Created {self.rows:,} rows in {elapsed:.1f}s ({self.rows / elapsed:,.0f} rows/s)"
+        ))
+
+    def bulk_create(self, model, objects, keep=True):
+        objects = iter(objects)
+        created = []
+        count = 0
+        while chunk := list(islice(objects, self.chunk_size)):
+            model.objects.bulk_create(chunk)
+            if keep:
+                created.extend(chunk)
+            count += len(chunk)
+        self.rows += count
+        self.stdout.write(f"{model._meta.db_table}: {count:,} rows, {time.perf_counter() - self.started:.1f}s")
+        return created
+
+    def copy_rows(self, model, fields, rows):
+        if connection.vendor != "postgresql":
+            self.bulk_create(model, (model(**dict(zip(fields, row))) for row in rows), keep=False)
+            return
+        # COPY skips building model instances and RETURNING ids, several times faster than bulk_create
+        quote = connection.ops.quote_name
+        columns = ", ".join(quote(model._meta.get_field(field).column) for field in fields)
+        rows = iter(rows)
+        count = 0
+        with connection.cursor() as cursor:
+            while chunk := list(islice(rows, self.chunk_size)):
+                data = io.StringIO("".join(
+                    "\t".join(self.copy_value(value) for value in row) + "\n" for row in chunk
+                ))
+                cursor.copy_expert(f"COPY {quote(model._meta.db_table)} ({columns}) FROM STDIN", data)
+                count += len(chunk)
+        self.rows += count
+        self.stdout.write(f"{model._meta.db_table}: {count:,} rows, {time.perf_counter() - self.started:.1f}s")
+
+    @staticmethod
+    def copy_value(value):
+        if value is None:
+            return "\\N"
+        if isinstance(value, bool):
+            return "t" if value else "f"
+        return str(value)
+
+    def create_catalog(self, options):
+        fake, rng = self.fake, self.rng
+        genres = self.bulk_create(Genre, (Genre(name=fake.word().title()) for _ in range(options["genres"])))
+        actors = self.bulk_create(
+            Actor, (Actor(name=fake.first_name(), surname=fake.last_name()) for _ in range(options["actors"]))
+        )
+        directors = self.bulk_create(
+            Director, (Director(name=fake.first_name(), surname=fake.last_name()) for _ in range(options["directors"]))
+        )
+        movies = self.bulk_create(Movie, (
+            Movie(
+                name=fake.sentence(nb_words=3).rstrip("."), description=fake.text(), image="movies/generated.jpg",
+                rating=fake.pyfloat(left_digits=1, right_digits=1, positive=True)
+            ) for _ in range(options["movies"])
+        ))
+        self.bulk_create(MovieGenre, (
+            MovieGenre(movie=movie, genre=genre) for movie in movies for genre in rng.sample(genres, min(2, len(genres)))
+        ))
+        self.bulk_create(MovieActor, (
+            MovieActor(movie=movie, actor=actor)
+            for movie in movies for actor in rng.sample(actors, min(options["cast_size"], len(actors)))
+        ))
+        self.bulk_create(MovieDirector, (MovieDirector(movie=movie, director=rng.choice(directors)) for movie in movies))
+        return movies
+
+    def create_halls(self, options):
+        halls = self.bulk_create(MovieHall, (
+            MovieHall(name=f"Hall {number + 1}", rows=options["rows"], seats_per_row=options["seats_per_row"])
+            for number in range(options["halls"])
+        ))
+        self.copy_rows(Seat, ("hall_id", "row_number", "seat_number"), (
+            (hall.pk, row, seat)
+            for hall in halls for row in range(1, hall.rows + 1) for seat in range(1, hall.seats_per_row + 1)
+        ))
+        seats = defaultdict(list)
+        for seat in Seat.objects.filter(hall__in=halls).order_by("pk").values_list(
+            "pk", "hall_id", "row_number", "seat_number"
+        ).iterator(chunk_size=self.chunk_size):
+            seats[seat[1]].append(seat)
+        for hall in halls:
+            hall.seat_rows = seats[hall.pk]
+        return halls
+
+    def create_sessions(self, options, movies, halls):
+        rng = self.rng
+        sessions = []
+        skipped = 0
+        for day in range(options["days"]):
+            session_date = date.today() + timedelta(days=day)
+            # every hall's day is filled in start time order, so sessions in one hall never overlap
+            free_from = {hall.pk: DAY_START for hall in halls}
+            for number in range(options["sessions_per_day"]):
+                hall = halls[number % len(halls)]
+                start = free_from[hall.pk] + rng.randrange(0, 31, 5)
+                end = start + rng.randint(90, 150)
+                if end > DAY_END:
+                    skipped += 1
+                    continue
+                free_from[hall.pk] = end + BREAK_MINUTES
+                sessions.append(Session(
+                    movie=rng.choice(movies), hall=hall, session_date=session_date,
+                    date_start=date.today(), date_end=date.today() + timedelta(days=options["days"]),
+                    time_start=dt_time(start // 60, start % 60), time_end=dt_time(end // 60, end % 60),
+                    price=Decimal(rng.randint(5, 20)), available_seats=len(hall.seat_rows), lazy_seats=options["lazy"]
+                ))
+        if skipped:
+            self.stdout.write(self.style.WARNING(f"{skipped:,} sessions did not fit into the halls' days"))
+        return self.bulk_create(Session, sessions)
+
+    def create_orders(self, options, sessions, halls):
+        rng, fake = self.rng, self.fake
+        halls = {hall.pk: hall for hall in halls}
+        free = {}
+        planned = []
+        spent = defaultdict(Decimal)
+        for _ in range(options["orders"] if sessions else 0):
+            session = rng.choice(sessions)
+            if session.pk not in free:
+                free[session.pk] = list(halls[session.hall_id].seat_rows)
+                rng.shuffle(free[session.pk])
+            seats = [free[session.pk].pop() for _ in range(min(
+                rng.randint(1, options["max_seats_per_order"]), len(free[session.pk])
+            ))]
+            if not seats:
+                continue
+            user_index = rng.randrange(options["users"])
+            planned.append((user_index, session, seats))
+            spent[user_index] += session.price * len(seats)
+
+        password = make_password(None)
+        users = self.bulk_create(User, (
+            User(
+                username=f"{fake.user_name()}{number}", email=fake.email(), password=password,
+                money=Decimal(rng.randint(100, 1000)), total_spent=spent[number]
+            ) for number in range(options["users"])
+        ))
+        orders = self.bulk_create(Order, (
+            Order(user=users[user_index], purchase_price=session.price) for user_index, session, _ in planned
+        ))
+        self.bulk_create(WalletEntry, (
+            WalletEntry(user=order.user, order=order, kind=WalletEntry.PURCHASE, amount=-session.price * len(seats))
+            for order, (_, session, seats) in zip(orders, planned)
+        ))
+
+        booked = defaultdict(dict)
+        for order, (_, session, seats) in zip(orders, planned):
+            for seat_pk, *_ in seats:
+                booked[session.pk][seat_pk] = order.pk
+        self.copy_rows(
+            SessionSeat, ("session_id", "seat_id", "is_booked", "order_id"), self.get_session_seats(sessions, halls, booked)
+        )
+
+        for session in sessions:
+            hall = halls[session.hall_id]
+            bitmap = SeatBitmap()
+            for seat_pk, _, row_number, seat_number in hall.seat_rows:
+                if seat_pk in booked[session.pk]:
+                    bitmap.set(SeatBitmap.index(row_number, seat_number, hall.seats_per_row))
+            session.occupancy = bytes(bitmap)
+            session.available_seats = len(hall.seat_rows) - len(booked[session.pk])
+        Session.objects.bulk_update(
+            [session for session in sessions if booked[session.pk]], ["occupancy", "available_seats"],
+            batch_size=self.chunk_size
+        )
+
+    @staticmethod
+    def get_session_seats(sessions, halls, booked):
+        for session in sessions:
+            session_booked = booked[session.pk]
+            if session.lazy_seats:
+                for seat_pk, order_pk in session_booked.items():
+                    yield session.pk, seat_pk, True, order_pk
+                continue
+            for seat_pk, *_ in halls[session.hall_id].seat_rows:
+                order_pk = session_booked.get(seat_pk)
+                yield session.pk, seat_pk, order_pk is not None, order_pk
@@ -0,0 +1,10 @@
+from django.core.management.base import BaseCommand
+from cinema.models import Session
+
+
+class Command(BaseCommand):
+    help = "Recounts Session.available_seats from session seats and repairs sessions that drifted"
+
+    def handle(self, *args, **options):
+        fixed = Session.objects.reconcile_available_seats()
+        self.stdout.write(self.style.SUCCESS(f"Repaired available seats of {fixed} session(s)"))
@@ -0,0 +1,52 @@
+from datetime import datetime
+from decimal import Decimal
+from django.core.management.base import BaseCommand, CommandError
+from cinema.models import Movie, MovieHall
+from cinema.scheduling import schedule_sessions, SchedulingError
+
+
+def parse_slot(value):
+    try:
+        time_start, time_end = value.split("-")
+        return datetime.strptime(time_start, "%H:%M").time(), datetime.strptime(time_end, "%H:%M").time()
+    except ValueError:
+        raise CommandError(f"Slot '{value}' should look like 10:00-12:00")
+
+
+def parse_date(value):
+    try:
+        return datetime.strptime(value, "%Y-%m-%d").date()
+    except ValueError:
+        raise CommandError(f"Date '{value}' should look like 2024-05-01")
+
+
+class Command(BaseCommand):
+    help = "Creates sessions of a movie in a hall for every slot of every day in a date range"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--movie", type=int, required=True)
+        parser.add_argument("--hall", type=int, required=True)
+        parser.add_argument("--from", dest="date_start", type=parse_date, required=True)
+        parser.add_argument("--to", dest="date_end", type=parse_date, required=True)
+        parser.add_argument("--price", type=Decimal, required=True)
+        parser.add_argument("--slot", dest="slots", type=parse_slot, action="append", required=True)
+
+    def handle(self, *args, **options):
+        try:
+            movie = Movie.objects.get(pk=options["movie"])
+            hall = MovieHall.objects.get(pk=options["hall"])
+        except (Movie.DoesNotExist, MovieHall.DoesNotExist) as error:
+            raise CommandError(str(error))
+
+        try:
+            sessions = schedule_sessions(
+                movie=movie,
+                hall=hall,
+                slots=options["slots"],
+                date_start=options["date_start"],
+                date_end=options["date_end"],
+                price=options["price"],
+            )
+        except SchedulingError as error:
+            raise CommandError(str(error))
+        self.stdout.write(self.style.SUCCESS(f"Created {len(sessions)} session(s)"))
@@ -0,0 +1,10 @@
+from django.core.management.base import BaseCommand
+from cinema.models import SeatHold
+
+
+class Command(BaseCommand):
+    help = "Deletes seat holds whose time has expired"
+
+    def handle(self, *args, **options):
+        deleted = SeatHold.objects.sweep_expired()
+        self.stdout.write(self.style.SUCCESS(f"Released {deleted} expired seat hold(s)"))
@@ -1,15 +1,172 @@
+from datetime import datetime
+from django.contrib.postgres.aggregates import ArrayAgg
 from django.db import models
-from django.db.models import Q
+from django.db.models import (
+    Q, Case, Count, DecimalField, Exists, ExpressionWrapper, F, IntegerField, Max, Min, OuterRef, Prefetch, Subquery,
+    When
+)
+from django.db.models.functions import Coalesce
+from .bitmap import SeatBitmap
+from .cache import bump_listing_version
 
 
 class SessionManager(models.Manager):
-    def exists_session_by_time(self, time, session_date, hall, session_pk=None):
-        queryset = self.model.objects.filter(
-            Q(time_start__lte=time) & Q(time_end__gte=time),
+    def for_listing(self, staff_flags=False):
+        queryset = self.select_related('movie').only(
+            'price', 'available_seats', 'time_start', 'session_date', 'hall', 'movie__name', 'movie__image'
+        )
+        if staff_flags:
+            SessionSeat = self.model._meta.get_field('session_seats').related_model
+            booked_seats = SessionSeat.objects.filter(is_booked=True)
+            queryset = queryset.annotate(
+                has_booked_seats=Exists(booked_seats.filter(session=OuterRef('pk'))),
+                hall_has_booked_seats=Exists(booked_seats.filter(session__hall=OuterRef('hall'))),
+            )
+        return queryset
+
+    def overlapping(self, hall, session_date, time_start, time_end, session_pk=None):
+        queryset = self.filter(
             hall=hall,
-            session_date=session_date
+            session_date=session_date,
+            time_start__lte=time_end,
+            time_end__gte=time_start
         )
         if session_pk is not None:
             queryset = queryset.exclude(pk=session_pk)
-        print(queryset.exists())
-        return queryset.exists()
+        return queryset
+
+    def exists_overlapping(self, hall, session_date, time_start, time_end, session_pk=None):
+        return self.overlapping(hall, session_date, time_start, time_end, session_pk).exists()
+
+    def find_conflicts(self, hall, dates, slots):
+        overlaps = Q()
+        for time_start, time_end in slots:
+            overlaps |= Q(time_start__lte=time_end, time_end__gte=time_start)
+        return self.filter(overlaps, hall=hall, session_date__in=dates).order_by('session_date', 'time_start')
+
+    def reconcile_available_seats(self):
+        SessionSeat = self.model._meta.get_field('session_seats').related_model
+        Seat = SessionSeat._meta.get_field('seat').related_model
+
+        def count(queryset, group_by):
+            return Coalesce(Subquery(
+                queryset.order_by().values(group_by).annotate(count=Count('pk')).values('count'),
+                output_field=IntegerField()
+            ), 0)
+
+        free_rows = count(SessionSeat.objects.filter(session=OuterRef('pk'), is_booked=False), 'session')
+        booked_rows = count(SessionSeat.objects.filter(session=OuterRef('pk'), is_booked=True), 'session')
+        hall_seats = count(Seat.objects.filter(hall=OuterRef('hall')), 'hall')
+        free_seats = Case(When(lazy_seats=True, then=hall_seats - booked_rows), default=free_rows)
+        drifted = self.annotate(free_seats=free_seats).exclude(available_seats=F('free_seats'))
+        days = set(drifted.values_list('session_date', flat=True))
+        fixed = self.filter(pk__in=drifted.values('pk')).update(available_seats=free_seats)
+        bump_listing_version(*days)
+        return fixed
+
+    def claim_seats(self, session_pk, indexes):
+        while True:
+            occupancy = self.filter(pk=session_pk).values_list('occupancy', flat=True).get()
+            bitmap = SeatBitmap(occupancy)
+            taken = bitmap.claim(indexes)
+            if taken:
+                return taken
+            claimed = self.filter(pk=session_pk, occupancy=occupancy).update(
+                occupancy=bytes(bitmap),
+                available_seats=F('available_seats') - len(indexes),
+                seats_version=F('seats_version') + 1
+            )
+            if claimed:
+                return []
+
+    def release_seats(self, session_pk, indexes):
+        while True:
+            occupancy = self.filter(pk=session_pk).values_list('occupancy', flat=True).get()
+            bitmap = SeatBitmap(occupancy)
+            bitmap.release(indexes)
+            released = self.filter(pk=session_pk, occupancy=occupancy).update(
+                occupancy=bytes(bitmap),
+                available_seats=F('available_seats') + len(indexes),
+                seats_version=F('seats_version') + 1
+            )
+            if released:
+                return
+
+    def bump_seats_version(self, *session_pks):
+        return self.filter(pk__in=session_pks).update(seats_version=F('seats_version') + 1)
+
+    @staticmethod
+    def get_active_holds(user=None):
+        holds = Q(seat_holds__expires_at__gt=datetime.now())
+        if user is not None:
+            holds &= ~Q(seat_holds__user=user)
+        return holds
+
+    def seat_map_state(self, session_pk, user=None):
+        # holds expire without bumping seats_version, the next expiry tells clients when the map goes stale
+        return self.filter(pk=session_pk).values('seats_version').annotate(
+            holds_expire_at=Min('seat_holds__expires_at', filter=self.get_active_holds(user))
+        ).order_by('pk').first()
+
+    def seat_map(self, session_pk, user=None):
+        holds = self.get_active_holds(user)
+        held_index = (
+            (F('seat_holds__seat__row_number') - 1) * F('hall__seats_per_row') + F('seat_holds__seat__seat_number') - 1
+        )
+        return self.filter(pk=session_pk).values(
+            'seats_version', 'occupancy', rows=F('hall__rows'), seats_per_row=F('hall__seats_per_row')
+        ).annotate(
+            held=ArrayAgg(held_index, filter=holds, default=[]),
+            holds_expire_at=Min('seat_holds__expires_at', filter=holds)
+        ).order_by('pk').first()
+
+
+class SeatHoldManager(models.Manager):
+    def sweep_expired(self):
+        Session = self.model._meta.get_field('session').related_model
+        expired = self.filter(expires_at__lte=datetime.now())
+        session_pks = set(expired.values_list('session', flat=True))
+        deleted, _ = expired.delete()
+        Session.objects.bump_seats_version(*session_pks)
+        return deleted
+
+
+class OrderManager(models.Manager):
+    def summaries(self, user):
+        SessionSeat = self.model._meta.get_field('session_seats').related_model
+        seats = SessionSeat.objects.select_related('seat').order_by('seat__row_number', 'seat__seat_number')
+        # an order is always placed for a single session, so Max() just picks its values
+        return self.filter(user=user, is_cancelled=False).annotate(
+            seats_count=Count('session_seats'),
+            # purchase_price is the seat price at purchase time, the session price may have changed since
+            total_price=ExpressionWrapper(
+                F('purchase_price') * Count('session_seats'), output_field=DecimalField(max_digits=10, decimal_places=2)
+            ),
+            movie_name=Max('session_seats__session__movie__name'),
+            movie_image=Max('session_seats__session__movie__image'),
+            session_date=Max('session_seats__session__session_date'),
+            time_start=Max('session_seats__session__time_start'),
+        ).prefetch_related(Prefetch('session_seats', queryset=seats, to_attr='seats')).order_by('-id')
+
+    def history(self, user):
+        return self.filter(user=user, is_cancelled=False).values('id', 'purchase_price')
+
+    def history_seats(self, order_ids):
+        SessionSeat = self.model._meta.get_field('session_seats').related_model
+        return SessionSeat.objects.filter(order_id__in=order_ids).order_by(
+            'order_id', 'seat__row_number', 'seat__seat_number'
+        ).values(
+            'order_id',
+            'seat_id',
+            'session_id',
+            row_number=F('seat__row_number'),
+            seat_number=F('seat__seat_number'),
+            session_date=F('session__session_date'),
+            time_start=F('session__time_start'),
+            time_end=F('session__time_end'),
+            price=F('session__price'),
+            movie_id=F('session__movie_id'),
+            movie_name=F('session__movie__name'),
+            hall_id=F('session__hall_id'),
+            hall_name=F('session__hall__name'),
+        )
@@ -0,0 +1,32 @@
+# Generated by Django 4.2 on 2026-10-18 22:19
+
+from django.db import migrations, models
+from django.db.models import Count, IntegerField, OuterRef, Subquery
+from django.db.models.functions import Coalesce
+
+
+def fill_available_seats(apps, schema_editor):
+    Session = apps.get_model('cinema', 'Session')
+    SessionSeat = apps.get_model('cinema', 'SessionSeat')
+    free_seats = SessionSeat.objects.filter(
+        session=OuterRef('pk'), is_booked=False
+    ).order_by().values('session').annotate(count=Count('pk')).values('count')
+    Session.objects.update(
+        available_seats=Coalesce(Subquery(free_seats, output_field=IntegerField()), 0)
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('cinema', '0004_alter_sessionseat_seat'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='session',
+            name='available_seats',
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+        migrations.RunPython(fill_available_seats, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,34 @@
+# Generated by Django 4.2 on 2026-10-18 22:21
+
+from collections import defaultdict
+from django.db import migrations, models
+from cinema.bitmap import SeatBitmap
+
+
+def fill_occupancy(apps, schema_editor):
+    Session = apps.get_model('cinema', 'Session')
+    SessionSeat = apps.get_model('cinema', 'SessionSeat')
+    bitmaps = defaultdict(SeatBitmap)
+    booked = SessionSeat.objects.filter(is_booked=True).values_list(
+        'session', 'seat__row_number', 'seat__seat_number', 'seat__hall__seats_per_row'
+    )
+    for session_id, row, seat, per_row in booked.iterator():
+        bitmaps[session_id].set(SeatBitmap.index(row, seat, per_row))
+    for session_id, bitmap in bitmaps.items():
+        Session.objects.filter(pk=session_id).update(occupancy=bytes(bitmap))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('cinema', '0005_session_available_seats'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='session',
+            name='occupancy',
+            field=models.BinaryField(default=b''),
+        ),
+        migrations.RunPython(fill_occupancy, migrations.RunPython.noop),
+    ]
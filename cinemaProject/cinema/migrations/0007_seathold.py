@@ -0,0 +1,33 @@
+# Generated by Django 4.2 on 2026-10-18 22:22
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('cinema', '0006_session_occupancy'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='SeatHold',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('expires_at', models.DateTimeField(db_index=True)),
+                ('seat', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='seat_holds', to='cinema.seat')),
+                ('session', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='seat_holds', to='cinema.session')),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='seat_holds', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'db_table': 'seat_hold',
+            },
+        ),
+        migrations.AddConstraint(
+            model_name='seathold',
+            constraint=models.UniqueConstraint(fields=('session', 'seat'), name='unique_seat_hold'),
+        ),
+    ]
@@ -0,0 +1,44 @@
+# Generated by Django 4.2 on 2026-10-18 22:24
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+from django.db.models import Count, Sum
+
+
+def fill_wallet_entries(apps, schema_editor):
+    Order = apps.get_model('cinema', 'Order')
+    WalletEntry = apps.get_model('cinema', 'WalletEntry')
+    orders = Order.objects.annotate(
+        seats=Count('session_seats'), total=Sum('session_seats__session__price')
+    ).filter(seats__gt=0).values_list('pk', 'user', 'total')
+    WalletEntry.objects.bulk_create(
+        [WalletEntry(order_id=pk, user_id=user_id, kind='purchase', amount=-total) for pk, user_id, total in orders],
+        batch_size=1000
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('cinema', '0007_seathold'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='WalletEntry',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('kind', models.CharField(choices=[('purchase', 'Purchase'), ('refund', 'Refund')], max_length=20)),
+                ('amount', models.DecimalField(decimal_places=2, max_digits=10)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('order', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='wallet_entries', to='cinema.order')),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.DO_NOTHING, related_name='wallet_entries', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'db_table': 'wallet_entry',
+            },
+        ),
+        migrations.RunPython(fill_wallet_entries, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 4.2 on 2026-10-18 22:26
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('cinema', '0008_walletentry'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='session',
+            name='lazy_seats',
+            field=models.BooleanField(default=False, editable=False),
+        ),
+    ]
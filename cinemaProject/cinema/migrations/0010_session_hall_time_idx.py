@@ -0,0 +1,17 @@
+# Generated by Django 4.2 on 2026-10-18 22:28
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('cinema', '0009_session_lazy_seats'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='session',
+            index=models.Index(fields=['hall', 'session_date', 'time_start'], name='session_hall_time_idx'),
+        ),
+    ]
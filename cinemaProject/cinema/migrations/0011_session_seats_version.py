@@ -0,0 +1,18 @@
+# Generated by Django 4.2 on 2026-10-18 22:35
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('cinema', '0010_session_hall_time_idx'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='session',
+            name='seats_version',
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+    ]
@@ -0,0 +1,17 @@
+# Generated by Django 4.2 on 2026-10-18 22:37
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('cinema', '0011_session_seats_version'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='order',
+            index=models.Index(fields=['user', 'id'], name='order_user_id_idx'),
+        ),
+    ]
@@ -0,0 +1,54 @@
+# Generated by Django 4.2 on 2026-10-18 22:38
+
+import django.contrib.postgres.search
+from django.db import migrations
+
+FILL_SEARCH_VECTOR = """
+UPDATE movie SET search_vector =
+    setweight(to_tsvector('english', coalesce(movie.name, '')), 'A')
+    || setweight(to_tsvector('english', coalesce((
+        SELECT string_agg(actor.name || ' ' || actor.surname, ' ')
+        FROM movie_actor JOIN actor ON actor.id = movie_actor.actor_id
+        WHERE movie_actor.movie_id = movie.id
+    ), '')), 'B')
+    || setweight(to_tsvector('english', coalesce((
+        SELECT string_agg(director.name || ' ' || director.surname, ' ')
+        FROM movie_director JOIN director ON director.id = movie_director.director_id
+        WHERE movie_director.movie_id = movie.id
+    ), '')), 'B')
+    || setweight(to_tsvector('english', coalesce((
+        SELECT string_agg(genre.name, ' ')
+        FROM movie_genre JOIN genre ON genre.id = movie_genre.genre_id
+        WHERE movie_genre.movie_id = movie.id
+    ), '')), 'B')
+    || setweight(to_tsvector('english', coalesce(movie.description, '')), 'C')
+"""
+
+
+def create_search_index(apps, schema_editor):
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    schema_editor.execute("CREATE INDEX movie_search_vector_idx ON movie USING gin (search_vector)")
+    schema_editor.execute(FILL_SEARCH_VECTOR)
+
+
+def drop_search_index(apps, schema_editor):
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    schema_editor.execute("DROP INDEX IF EXISTS movie_search_vector_idx")
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('cinema', '0012_order_user_id_idx'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='movie',
+            name='search_vector',
+            field=django.contrib.postgres.search.SearchVectorField(editable=False, null=True),
+        ),
+        migrations.RunPython(create_search_index, drop_search_index),
+    ]
@@ -0,0 +1,24 @@
+# Generated by Django 4.2 on 2026-10-18 23:14
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('cinema', '0013_movie_search_vector'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='order',
+            name='is_cancelled',
+            field=models.BooleanField(default=False),
+        ),
+        migrations.AlterField(
+            model_name='walletentry',
+            name='order',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.PROTECT, related_name='wallet_entries', to='cinema.order'),
+        ),
+    ]
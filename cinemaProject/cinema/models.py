@@ -1,7 +1,11 @@
-from django.db import models
+from django.conf import settings
+from django.contrib.postgres.search import SearchVectorField
+from django.db import models, transaction
 from django.contrib.auth import get_user_model
-from .managers import SessionManager
-from datetime import date
+from .managers import OrderManager, SessionManager, SeatHoldManager
+from .bitmap import SeatBitmap
+from .cache import bump_listing_version
+from datetime import date, datetime
 
 User = get_user_model()
 
@@ -45,6 +49,8 @@ class Movie(models.Model):
     genres = models.ManyToManyField(Genre, through="MovieGenre")
     directors = models.ManyToManyField(Director, through="MovieDirector")
     actors = models.ManyToManyField(Actor, through="MovieActor")
+    # kept up to date by cinema.signals, the GIN index over it is created by a migration on postgres only
+    search_vector = SearchVectorField(null=True, editable=False)
 
     class Meta:
         db_table = 'movie'
@@ -86,6 +92,11 @@ class MovieActor(models.Model):
         return f"{self.movie.name} - {self.actor.name}"
 
 
+class HallHasBookedSeats(Exception):
+    def __init__(self):
+        super().__init__("This hall can`t be updated, because it has booked sessions")
+
+
 class MovieHall(models.Model):
     name = models.CharField(max_length=100)
     rows = models.IntegerField()
@@ -105,22 +116,36 @@ class MovieHall(models.Model):
         Seat.objects.bulk_create(seats)
 
     def is_updateble_hall(self):
-        sessions = Session.objects.filter(hall=self)
-        if sessions:
-            for session in sessions:
-                if session.session_seats.filter(is_booked=True).exists():
-                    return False
-            return True
-        return True
-
-    def delete_seats_and_session_seats(self):
-        if self.is_updateble_hall():
-            self.seats.filter(hall=self).delete()
-
-    def update_seats_for_hall(self):
-        self.create_seats_for_hall()
-        for session in self.sessions.all():
-            session.create_session_seats()
+        return not SessionSeat.objects.filter(session__hall=self, is_booked=True).exists()
+
+    def relayout_seats(self):
+        layout = {(row, seat) for row in range(1, self.rows + 1) for seat in range(1, self.seats_per_row + 1)}
+        with transaction.atomic():
+            # claim_seats updates the session rows, locking them waits out bookings in flight and blocks new ones,
+            # so the check below can be trusted
+            list(self.sessions.select_for_update().values_list('pk', flat=True))
+            if not self.is_updateble_hall():
+                raise HallHasBookedSeats()
+            existing = {(row, seat): pk for pk, row, seat in self.seats.values_list('pk', 'row_number', 'seat_number')}
+            removed = [pk for coordinates, pk in existing.items() if coordinates not in layout]
+            if removed:
+                SessionSeat.objects.filter(seat_id__in=removed).delete()
+                Seat.objects.filter(pk__in=removed).delete()
+
+            added = Seat.objects.bulk_create([
+                Seat(row_number=row, seat_number=seat, hall=self) for row, seat in sorted(layout - existing.keys())
+            ])
+            eager_sessions = self.sessions.filter(lazy_seats=False).values_list('pk', flat=True)
+            SessionSeat.objects.bulk_create([
+                SessionSeat(session_id=session_id, seat=seat) for session_id in eager_sessions for seat in added
+            ])
+            # seat indexes depend on seats_per_row, the hall has no booked seats so every bitmap starts empty
+            self.sessions.update(
+                available_seats=len(existing) - len(removed) + len(added),
+                occupancy=b'',
+                seats_version=models.F('seats_version') + 1
+            )
+            bump_listing_version(*self.sessions.values_list('session_date', flat=True).distinct())
 
 
 class Seat(models.Model):
@@ -144,33 +169,119 @@ class Session(models.Model):
     session_date = models.DateField()
     price = models.DecimalField(max_digits=10, decimal_places=2, default=0.00)
     hall = models.ForeignKey(MovieHall, models.PROTECT, related_name='sessions')
+    available_seats = models.PositiveIntegerField(default=0, editable=False)
+    occupancy = models.BinaryField(default=b'', editable=False)
+    lazy_seats = models.BooleanField(default=False, editable=False)
+    seats_version = models.PositiveIntegerField(default=0, editable=False)
 
     objects = SessionManager()
 
+    # maintained by conditional updates only, saving a stale instance must not overwrite them
+    SEAT_STATE_FIELDS = ("available_seats", "occupancy", "seats_version")
+
     class Meta:
         db_table = "session"
+        indexes = [
+            models.Index(fields=["hall", "session_date", "time_start"], name="session_hall_time_idx"),
+        ]
 
     def __str__(self):
         return f"Movie: {self.movie.name}, price: {self.price}, in hall: {self.hall.name}"
 
-    @property
-    def get_available_seats(self):
-        return SessionSeat.objects.filter(session=self, is_booked=False).count()
+    def save(self, *args, **kwargs):
+        if not self.pk:
+            self.lazy_seats = settings.SESSION_SEATS_MODE == "lazy"
+        elif not self._state.adding and kwargs.get('update_fields') is None:
+            kwargs['update_fields'] = [
+                field.name for field in self._meta.concrete_fields
+                if not field.primary_key and field.name not in self.SEAT_STATE_FIELDS
+            ]
+        super().save(*args, **kwargs)
 
     def create_session_seats(self):
+        if self.lazy_seats:
+            self.available_seats = Seat.objects.filter(hall_id=self.hall_id).count()
+            self.occupancy = b''
+            Session.objects.filter(pk=self.pk).update(
+                available_seats=self.available_seats, occupancy=b'', seats_version=models.F('seats_version') + 1
+            )
+            bump_listing_version(self.session_date)
+            return
+
         session_seats = []
         hall = self.hall
         seats = Seat.objects.filter(hall=hall).order_by('pk')
         for seat in seats:
             session_seats.append(SessionSeat(session=self, seat=seat))
-        SessionSeat.objects.bulk_create(session_seats)
+        with transaction.atomic():
+            SessionSeat.objects.bulk_create(session_seats)
+            self.available_seats = len(session_seats)
+            self.occupancy = b''
+            Session.objects.filter(pk=self.pk).update(
+                available_seats=self.available_seats, occupancy=b'', seats_version=models.F('seats_version') + 1
+            )
+            bump_listing_version(self.session_date)
+
+    def seat_index(self, row_number, seat_number):
+        return SeatBitmap.index(row_number, seat_number, self.hall.seats_per_row)
+
+    def is_seat_free(self, row_number, seat_number):
+        return not SeatBitmap(self.occupancy).is_set(self.seat_index(row_number, seat_number))
+
+    def count_booked_seats(self):
+        return SeatBitmap(self.occupancy).count()
+
+    def get_held_seats(self, user=None):
+        held_seats = SeatHold.objects.filter(session=self, expires_at__gt=datetime.now())
+        if user is not None:
+            held_seats = held_seats.exclude(user=user)
+        return held_seats.values('seat')
+
+    def get_hall_seats(self, user=None):
+        return Seat.objects.filter(hall_id=self.hall_id).exclude(pk__in=self.get_held_seats(user)).order_by('pk')
+
+    def to_free_session_seats(self, seats):
+        bitmap = SeatBitmap(self.occupancy)
+        seats_per_row = self.hall.seats_per_row
+        return [
+            SessionSeat(session=self, seat=seat) for seat in seats
+            if not bitmap.is_set(SeatBitmap.index(seat.row_number, seat.seat_number, seats_per_row))
+        ]
+
+    def get_free_session_seats(self, user=None):
+        if self.lazy_seats:
+            return self.to_free_session_seats(self.get_hall_seats(user))
+        return self.session_seats.filter(is_booked=False).exclude(
+            seat__in=self.get_held_seats(user)
+        ).select_related('seat')
+
+    def get_free_seat_ids(self, seat_ids, user=None):
+        if self.lazy_seats:
+            bitmap = SeatBitmap(self.occupancy)
+            seats = Seat.objects.filter(hall_id=self.hall_id, pk__in=seat_ids).exclude(
+                pk__in=self.get_held_seats(user)
+            ).values_list('pk', 'row_number', 'seat_number', 'hall__seats_per_row')
+            return [
+                pk for pk, row, seat, per_row in seats
+                if not bitmap.is_set(SeatBitmap.index(row, seat, per_row))
+            ]
+        return list(self.session_seats.filter(seat_id__in=seat_ids, is_booked=False).exclude(
+            seat__in=self.get_held_seats(user)
+        ).values_list('seat_id', flat=True))
 
     def is_session_seats_booked(self):
         return not self.session_seats.filter(is_booked=True).exists()
 
     def delete_session_seats(self):
         if self.is_session_seats_booked():
-            self.session_seats.all().delete()
+            with transaction.atomic():
+                self.session_seats.all().delete()
+                self.available_seats = 0
+                self.occupancy = b''
+                Session.objects.filter(pk=self.pk).update(
+                    available_seats=0, occupancy=b'', seats_version=models.F('seats_version') + 1
+                )
+                bump_listing_version(self.session_date)
 
     def date_check(self):
         days_difference = (self.session_date - date.today()).days
@@ -180,14 +291,47 @@ class Session(models.Model):
 class Order(models.Model):
     user = models.ForeignKey(User, on_delete=models.DO_NOTHING, related_name="orders")
     purchase_price = models.DecimalField(max_digits=10, decimal_places=2, default=0.00)
+    # cancelled orders are kept, their wallet entries still point at them
+    is_cancelled = models.BooleanField(default=False)
+
+    objects = OrderManager()
 
     class Meta:
         db_table = "order"
+        indexes = [
+            models.Index(fields=["user", "id"], name="order_user_id_idx"),
+        ]
 
     def __str__(self):
         return f"User: {self.user.username}, purchase_price: {self.purchase_price}"
 
 
+class WalletEntry(models.Model):
+    PURCHASE = "purchase"
+    REFUND = "refund"
+    KIND_CHOICES = [
+        (PURCHASE, "Purchase"),
+        (REFUND, "Refund"),
+    ]
+
+    user = models.ForeignKey(User, on_delete=models.DO_NOTHING, related_name="wallet_entries")
+    order = models.ForeignKey(Order, on_delete=models.PROTECT, related_name="wallet_entries", blank=True, null=True)
+    kind = models.CharField(max_length=20, choices=KIND_CHOICES)
+    amount = models.DecimalField(max_digits=10, decimal_places=2)
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        db_table = "wallet_entry"
+
+    def __str__(self):
+        return f"User: {self.user_id}, {self.kind}: {self.amount}"
+
+    def save(self, *args, **kwargs):
+        if self.pk:
+            raise ValueError("Wallet entries can`t be changed")
+        super().save(*args, **kwargs)
+
+
 class SessionSeat(models.Model):
     session = models.ForeignKey(Session, on_delete=models.DO_NOTHING, related_name="session_seats")
     seat = models.ForeignKey(Seat, on_delete=models.CASCADE, related_name="session_seats")
@@ -201,5 +345,19 @@ class SessionSeat(models.Model):
         return f"Row - {self.seat.row_number}, Seat - {self.seat.seat_number}"
 
 
+class SeatHold(models.Model):
+    session = models.ForeignKey(Session, on_delete=models.CASCADE, related_name="seat_holds")
+    seat = models.ForeignKey(Seat, on_delete=models.CASCADE, related_name="seat_holds")
+    user = models.ForeignKey(User, on_delete=models.CASCADE, related_name="seat_holds")
+    expires_at = models.DateTimeField(db_index=True)
+
+    objects = SeatHoldManager()
 
+    class Meta:
+        db_table = "seat_hold"
+        constraints = [
+            models.UniqueConstraint(fields=["session", "seat"], name="unique_seat_hold"),
+        ]
 
+    def __str__(self):
+        return f"Seat {self.seat_id} held by {self.user_id} until {self.expires_at}"
@@ -0,0 +1,78 @@
+from datetime import timedelta
+from django.conf import settings
+from django.db import transaction
+from .cache import bump_listing_version
+from .models import MovieHall, Seat, Session, SessionSeat
+
+MAX_SCHEDULE_DAYS = 366
+
+
+class SchedulingError(Exception):
+    pass
+
+
+def get_schedule_dates(date_start, date_end):
+    return [date_start + timedelta(days=day) for day in range((date_end - date_start).days + 1)]
+
+
+def check_slots(slots):
+    slots = sorted(slots)
+    for time_start, time_end in slots:
+        if time_start >= time_end:
+            raise SchedulingError(f"Slot {time_start:%H:%M}-{time_end:%H:%M} should end after it starts")
+    for (start, end), (next_start, next_end) in zip(slots, slots[1:]):
+        if next_start <= end:
+            raise SchedulingError(f"Slots {start:%H:%M}-{end:%H:%M} and {next_start:%H:%M}-{next_end:%H:%M} overlap")
+
+
+def lock_free_hall(hall, session_date, time_start, time_end, session_pk=None):
+    # call inside transaction.atomic(), every session save that places a session takes the same hall row lock,
+    # so the overlap check holds until the transaction commits
+    MovieHall.objects.select_for_update().get(pk=hall.pk)
+    if Session.objects.exists_overlapping(hall, session_date, time_start, time_end, session_pk):
+        raise SchedulingError("session on this time in that hall already exists")
+
+
+def schedule_sessions(movie, hall, slots, date_start, date_end, price):
+    if date_start > date_end:
+        raise SchedulingError("session date should be between start date and end date")
+    if (date_end - date_start).days >= MAX_SCHEDULE_DAYS:
+        raise SchedulingError(f"sessions can be scheduled at most {MAX_SCHEDULE_DAYS} days ahead at once")
+    check_slots(slots)
+    dates = get_schedule_dates(date_start, date_end)
+
+    with transaction.atomic():
+        # concurrent runs for the same hall wait here, so both cannot pass the conflict check
+        MovieHall.objects.select_for_update().get(pk=hall.pk)
+        conflict = Session.objects.find_conflicts(hall, dates, slots).first()
+        if conflict is not None:
+            raise SchedulingError(
+                f"session on {conflict.session_date} {conflict.time_start:%H:%M}-{conflict.time_end:%H:%M} "
+                f"in that hall already exists"
+            )
+
+        lazy_seats = settings.SESSION_SEATS_MODE == "lazy"
+        seat_ids = list(Seat.objects.filter(hall=hall).order_by('pk').values_list('pk', flat=True))
+        sessions = Session.objects.bulk_create([
+            Session(
+                movie=movie,
+                hall=hall,
+                time_start=time_start,
+                time_end=time_end,
+                date_start=date_start,
+                date_end=date_end,
+                session_date=session_date,
+                price=price,
+                available_seats=len(seat_ids),
+                lazy_seats=lazy_seats,
+            )
+            for session_date in dates
+            for time_start, time_end in sorted(slots)
+        ])
+        if not lazy_seats:
+            SessionSeat.objects.bulk_create(
+                [SessionSeat(session=session, seat_id=seat_id) for session in sessions for seat_id in seat_ids],
+                batch_size=5000
+            )
+        bump_listing_version(*dates)
+    return sessions
@@ -0,0 +1,93 @@
+import re
+from collections import defaultdict
+from django.contrib.postgres.search import SearchQuery, SearchRank, SearchVector
+from django.db import connection
+from django.db.models import F, Value
+from .models import Movie, MovieActor, MovieDirector, MovieGenre
+
+SEARCH_CONFIG = "english"
+SEARCH_LIMIT = 50
+# the same weights postgres ts_rank gives to A, B and C labels
+WEIGHTS = {"A": 1.0, "B": 0.4, "C": 0.2}
+TOKEN_RE = re.compile(r"\w+")
+
+
+def tokenize(text):
+    return TOKEN_RE.findall(text.lower())
+
+
+def get_search_documents(movie_ids=None):
+    movies = Movie.objects.all() if movie_ids is None else Movie.objects.filter(pk__in=movie_ids)
+    documents = {
+        pk: {"A": [name], "B": [], "C": [description]}
+        for pk, name, description in movies.values_list('pk', 'name', 'description')
+    }
+    related = (
+        (MovieActor, ('actor__name', 'actor__surname')),
+        (MovieDirector, ('director__name', 'director__surname')),
+        (MovieGenre, ('genre__name',)),
+    )
+    for model, fields in related:
+        for movie_id, *names in model.objects.filter(movie_id__in=documents).values_list('movie_id', *fields):
+            documents[movie_id]["B"].extend(names)
+    return {pk: {weight: " ".join(texts) for weight, texts in document.items()} for pk, document in documents.items()}
+
+
+def uses_search_vector():
+    return connection.vendor == "postgresql"
+
+
+def update_search_vectors(movie_ids):
+    if not uses_search_vector():
+        search_index.invalidate()
+        return
+    for pk, document in get_search_documents(movie_ids).items():
+        vector = SearchVector(Value(document["A"]), weight="A", config=SEARCH_CONFIG)
+        vector += SearchVector(Value(document["B"]), weight="B", config=SEARCH_CONFIG)
+        vector += SearchVector(Value(document["C"]), weight="C", config=SEARCH_CONFIG)
+        Movie.objects.filter(pk=pk).update(search_vector=vector)
+
+
+class InvertedIndex:
+    def __init__(self):
+        self.postings = None
+
+    def invalidate(self):
+        self.postings = None
+
+    def build(self):
+        postings = defaultdict(lambda: defaultdict(float))
+        for pk, document in get_search_documents().items():
+            for weight, text in document.items():
+                for token in tokenize(text):
+                    postings[token][pk] += WEIGHTS[weight]
+        self.postings = postings
+        return postings
+
+    def search(self, query):
+        postings = self.postings if self.postings is not None else self.build()
+        scores = None
+        for token in tokenize(query):
+            matches = postings.get(token, {})
+            if scores is None:
+                scores = dict(matches)
+            else:
+                scores = {pk: score + matches[pk] for pk, score in scores.items() if pk in matches}
+        return scores or {}
+
+
+search_index = InvertedIndex()
+
+
+def search_movies(query):
+    if uses_search_vector():
+        search_query = SearchQuery(query, config=SEARCH_CONFIG, search_type="websearch")
+        return Movie.objects.filter(search_vector=search_query).annotate(
+            rank=SearchRank(F('search_vector'), search_query)
+        ).order_by('-rank', '-rating')[:SEARCH_LIMIT]
+
+    scores = search_index.search(query)
+    movies = sorted(Movie.objects.filter(pk__in=scores), key=lambda movie: (-scores[movie.pk], -movie.rating))
+    for movie in movies:
+        movie.rank = scores[movie.pk]
+    return movies[:SEARCH_LIMIT]
@@ -0,0 +1,97 @@
+from django.db.models.signals import m2m_changed, post_delete, post_save, pre_save
+from django.dispatch import receiver
+from .autocomplete import catalog_autocomplete
+from .cache import bump_listing_version, invalidate_movie_payloads
+from .models import Actor, Director, Genre, Movie, MovieActor, MovieDirector, MovieGenre, Session
+from .search import search_index, update_search_vectors
+
+
+@receiver(pre_save, sender=Session)
+def remember_session_date(sender, instance, **kwargs):
+    instance._previous_session_date = None
+    if instance.pk:
+        instance._previous_session_date = sender.objects.filter(pk=instance.pk).values_list(
+            'session_date', flat=True
+        ).first()
+
+
+@receiver(post_save, sender=Session)
+def bump_listing_on_session_save(sender, instance, **kwargs):
+    days = [instance.session_date]
+    if getattr(instance, '_previous_session_date', None):
+        days.append(instance._previous_session_date)
+    bump_listing_version(*days)
+
+
+@receiver(post_delete, sender=Session)
+def bump_listing_on_session_delete(sender, instance, **kwargs):
+    bump_listing_version(instance.session_date)
+
+
+def movies_changed(movie_ids):
+    movie_ids = list(movie_ids)
+    update_search_vectors(movie_ids)
+    invalidate_movie_payloads(movie_ids)
+
+
+@receiver(post_save, sender=Movie)
+def update_movie_on_save(sender, instance, **kwargs):
+    movies_changed([instance.pk])
+
+
+@receiver(post_delete, sender=Movie)
+def update_movie_on_delete(sender, instance, **kwargs):
+    search_index.invalidate()
+    invalidate_movie_payloads([instance.pk])
+
+
+@receiver(post_save, sender=MovieActor)
+@receiver(post_delete, sender=MovieActor)
+@receiver(post_save, sender=MovieDirector)
+@receiver(post_delete, sender=MovieDirector)
+@receiver(post_save, sender=MovieGenre)
+@receiver(post_delete, sender=MovieGenre)
+def update_movie_on_credit_change(sender, instance, **kwargs):
+    movies_changed([instance.movie_id])
+
+
+@receiver(post_save, sender=Actor)
+@receiver(post_save, sender=Director)
+@receiver(post_save, sender=Genre)
+def update_movies_on_name_change(sender, instance, created, **kwargs):
+    if created:
+        return
+    through = Movie._meta.get_field(f"{sender._meta.model_name}s").remote_field.through
+    movies_changed(through.objects.filter(**{sender._meta.model_name: instance}).values_list('movie_id', flat=True))
+
+
+@receiver(m2m_changed, sender=MovieActor)
+@receiver(m2m_changed, sender=MovieDirector)
+@receiver(m2m_changed, sender=MovieGenre)
+def update_movies_on_m2m_change(sender, instance, action, reverse, pk_set, **kwargs):
+    if reverse and action == "pre_clear":
+        instance._cleared_movie_ids = list(
+            sender.objects.filter(**{instance._meta.model_name: instance}).values_list('movie_id', flat=True)
+        )
+    elif action in ("post_add", "post_remove", "post_clear"):
+        if not reverse:
+            movie_ids = [instance.pk]
+        elif action == "post_clear":
+            movie_ids = instance._cleared_movie_ids
+        else:
+            movie_ids = pk_set
+        movies_changed(movie_ids)
+
+
+@receiver(post_save, sender=Movie)
+@receiver(post_save, sender=Actor)
+@receiver(post_save, sender=Director)
+def update_autocomplete(sender, instance, **kwargs):
+    catalog_autocomplete.update(instance)
+
+
+@receiver(post_delete, sender=Movie)
+@receiver(post_delete, sender=Actor)
+@receiver(post_delete, sender=Director)
+def remove_from_autocomplete(sender, instance, **kwargs):
+    catalog_autocomplete.remove(instance)
@@ -0,0 +1,68 @@
+import os
+from django.conf import settings
+from django.test import SimpleTestCase, TestCase, override_settings
+from django.urls import reverse
+from cinema.autocomplete import PrefixIndex, catalog_autocomplete
+from cinema.factories import ActorFactory, DirectorFactory, MovieFactory
+
+media_for_tests = os.path.join(settings.BASE_DIR, 'media_for_tests')
+
+
+class PrefixIndexTests(SimpleTestCase):
+    def setUp(self):
+        self.index = PrefixIndex(limit=2)
+        self.index.add(1, "The Matrix", 8.7)
+        self.index.add(2, "Matrix Reloaded", 7.2)
+        self.index.add(3, "Mad Max", 8.1)
+
+    def test_search_by_any_word(self):
+        self.assertEqual([key for key, label in self.index.search("matr")], [1, 2])
+        self.assertEqual([key for key, label in self.index.search("the ma")], [1])
+        self.assertEqual(self.index.search("x"), [])
+
+    def test_top_k_is_bounded(self):
+        self.assertEqual([key for key, label in self.index.search("m")], [1, 3])
+
+    def test_remove_and_rename(self):
+        self.index.search("m")
+        self.index.remove(1)
+        self.assertEqual([key for key, label in self.index.search("m")], [3, 2])
+        self.index.add(3, "Fury Road", 8.1)
+        self.assertEqual([key for key, label in self.index.search("m")], [2])
+        self.assertEqual(self.index.search("fury"), [(3, "Fury Road")])
+
+    def test_search_skips_entries_removed_concurrently(self):
+        self.index.search("m")
+        del self.index.entries[1]
+        self.assertEqual([key for key, label in self.index.search("m")], [3])
+
+
+class CatalogAutocompleteTests(TestCase):
+    @override_settings(MEDIA_ROOT=media_for_tests)
+    def setUp(self):
+        catalog_autocomplete.index = None
+        self.movie = MovieFactory(name="Keanu", rating=6.0)
+        self.actor = ActorFactory(name="Keanu", surname="Reeves")
+        self.director = DirectorFactory(name="Lana", surname="Wachowski")
+
+    def test_autocomplete_api(self):
+        response = self.client.get(reverse('autocomplete'), {"q": "kea"})
+        self.assertEqual(response.json(), [
+            {"kind": "movie", "id": self.movie.pk, "label": "Keanu"},
+            {"kind": "actor", "id": self.actor.pk, "label": "Keanu Reeves"},
+        ])
+
+    def test_signals_update_index(self):
+        catalog_autocomplete.search("wach")
+        self.director.surname = "Wachowskis"
+        self.director.save()
+        self.assertEqual(catalog_autocomplete.search("wachowskis")[0]["id"], self.director.pk)
+        self.actor.delete()
+        self.assertEqual(catalog_autocomplete.search("reeves"), [])
+
+    def test_stale_index_is_served_during_rebuild(self):
+        index = catalog_autocomplete.get_index()
+        catalog_autocomplete.built_at = 0
+        with catalog_autocomplete.rebuild_lock:
+            self.assertIs(catalog_autocomplete.get_index(), index)
+        self.assertIsNot(catalog_autocomplete.get_index(), index)
@@ -0,0 +1,27 @@
+from django.test import SimpleTestCase
+from cinema.bitmap import SeatBitmap
+
+
+class SeatBitmapTests(SimpleTestCase):
+    def test_index(self):
+        self.assertEqual(SeatBitmap.index(1, 1, 10), 0)
+        self.assertEqual(SeatBitmap.index(3, 4, 10), 23)
+
+    def test_set_and_clear(self):
+        bitmap = SeatBitmap()
+        bitmap.set(0)
+        bitmap.set(23)
+        self.assertTrue(bitmap.is_set(23))
+        self.assertFalse(bitmap.is_set(22))
+        self.assertFalse(bitmap.is_set(1000))
+        self.assertEqual(bitmap.count(), 2)
+        bitmap.clear(23)
+        self.assertFalse(bitmap.is_set(23))
+        self.assertEqual(bytes(bitmap), b'\x01\x00\x00')
+
+    def test_claim_is_all_or_nothing(self):
+        bitmap = SeatBitmap()
+        self.assertEqual(bitmap.claim([1, 2]), [])
+        self.assertEqual(bitmap.claim([2, 3]), [2])
+        self.assertFalse(bitmap.is_set(3))
+        self.assertEqual(bitmap.count(), 2)
@@ -0,0 +1,274 @@
+import json
+import os
+from datetime import datetime, timedelta
+from io import StringIO
+from django.conf import settings
+from django.core.management import call_command
+from django.db import connection
+from django.test import TestCase, TransactionTestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from cinema.booking import book_seats, cancel_order, hold_seats, BookingError, NotEnoughMoney, SeatsUnavailable
+from cinema.factories import MovieHallFactory, SessionTodayFactory, SuperUserFactory, UserFactory
+from cinema.models import MovieHall, Order, SeatHold, Session, SessionSeat, WalletEntry
+
+media_for_tests = os.path.join(settings.BASE_DIR, 'media_for_tests')
+
+
+class BookSeatsTests(TestCase):
+    @override_settings(MEDIA_ROOT=media_for_tests)
+    def setUp(self):
+        self.user = UserFactory()
+        self.user.money = 1000
+        self.user.save(update_fields=['money'])
+        self.hall = MovieHallFactory(rows=5, seats_per_row=10)
+        self.hall.create_seats_for_hall()
+        self.session = SessionTodayFactory(hall=self.hall, price=10)
+        self.session.create_session_seats()
+        self.seat_ids = list(self.hall.seats.order_by('pk').values_list('pk', flat=True))
+
+    def test_book_seats(self):
+        order = book_seats(self.user, self.session, self.seat_ids[:3])
+        booked = SessionSeat.objects.filter(session=self.session, is_booked=True)
+        self.assertEqual(set(booked.values_list('seat_id', flat=True)), set(self.seat_ids[:3]))
+        self.assertEqual(set(booked.values_list('order', flat=True)), {order.pk})
+        self.user.refresh_from_db()
+        self.assertEqual(self.user.money, 970)
+
+    def test_book_seats_is_all_or_nothing(self):
+        book_seats(self.user, self.session, [self.seat_ids[1]])
+        with self.assertRaises(SeatsUnavailable) as error:
+            book_seats(self.user, self.session, self.seat_ids[:3])
+        self.assertEqual([seat.pk for seat in error.exception.seats], [self.seat_ids[1]])
+        self.assertEqual(SessionSeat.objects.filter(session=self.session, is_booked=True).count(), 1)
+        self.assertEqual(Order.objects.count(), 1)
+        self.user.refresh_from_db()
+        self.assertEqual(self.user.money, 990)
+
+    def test_book_seats_from_another_hall(self):
+        other_hall = MovieHallFactory(rows=1, seats_per_row=1)
+        other_hall.create_seats_for_hall()
+        with self.assertRaises(SeatsUnavailable):
+            book_seats(self.user, self.session, [other_hall.seats.get().pk])
+        self.assertFalse(Order.objects.exists())
+
+    def test_book_without_seats(self):
+        with self.assertRaises(BookingError):
+            book_seats(self.user, self.session, [])
+
+    def test_book_seats_query_count_does_not_depend_on_seats(self):
+        with CaptureQueriesContext(connection) as one_seat:
+            book_seats(self.user, self.session, self.seat_ids[:1])
+        with CaptureQueriesContext(connection) as many_seats:
+            book_seats(self.user, self.session, self.seat_ids[10:30])
+        self.assertEqual(len(one_seat), len(many_seats))
+
+    def test_book_seats_without_money(self):
+        self.user.money = 15
+        self.user.save(update_fields=['money'])
+        with self.assertRaises(NotEnoughMoney):
+            book_seats(self.user, self.session, self.seat_ids[:2])
+        self.assertFalse(SessionSeat.objects.filter(session=self.session, is_booked=True).exists())
+        self.assertFalse(Order.objects.exists())
+        self.user.refresh_from_db()
+        self.assertEqual(self.user.money, 15)
+
+    def test_book_seats_writes_wallet_entry(self):
+        order = book_seats(self.user, self.session, self.seat_ids[:3])
+        entry = WalletEntry.objects.get()
+        self.assertEqual((entry.order, entry.kind, entry.amount), (order, WalletEntry.PURCHASE, -30))
+        self.user.refresh_from_db()
+        self.assertEqual(self.user.total_spent, 30)
+        cancel_order(order)
+        self.user.refresh_from_db()
+        self.assertEqual(self.user.total_spent, 0)
+
+    def test_book_seats_updates_available_seats(self):
+        book_seats(self.user, self.session, self.seat_ids[:4])
+        self.session.refresh_from_db()
+        self.assertEqual(self.session.available_seats, 46)
+
+    def test_cancel_order(self):
+        order = book_seats(self.user, self.session, self.seat_ids[:4])
+        cancel_order(order)
+        self.session.refresh_from_db()
+        self.user.refresh_from_db()
+        self.assertEqual(self.session.available_seats, 50)
+        self.assertEqual(self.user.money, 1000)
+        self.assertFalse(SessionSeat.objects.filter(session=self.session, is_booked=True).exists())
+        order.refresh_from_db()
+        self.assertTrue(order.is_cancelled)
+        self.assertFalse(Order.objects.history(self.user).exists())
+        self.assertEqual(
+            list(order.wallet_entries.order_by('pk').values_list('kind', 'amount')),
+            [(WalletEntry.PURCHASE, -40), (WalletEntry.REFUND, 40)]
+        )
+
+    def test_cancel_order_refunds_what_was_debited(self):
+        order = book_seats(self.user, self.session, self.seat_ids[:2])
+        Session.objects.filter(pk=self.session.pk).update(price=25)
+        cancel_order(order)
+        cancel_order(order)
+        self.user.refresh_from_db()
+        self.assertEqual(self.user.money, 1000)
+        self.assertEqual(order.wallet_entries.filter(kind=WalletEntry.REFUND).get().amount, 20)
+
+    def test_book_seats_updates_occupancy(self):
+        book_seats(self.user, self.session, self.seat_ids[:2])
+        self.session.refresh_from_db()
+        self.assertFalse(self.session.is_seat_free(1, 1))
+        self.assertFalse(self.session.is_seat_free(1, 2))
+        self.assertTrue(self.session.is_seat_free(1, 3))
+        self.assertEqual(self.session.count_booked_seats(), 2)
+
+    def test_claim_seats(self):
+        self.assertEqual(Session.objects.claim_seats(self.session.pk, [0, 1]), [])
+        self.assertEqual(Session.objects.claim_seats(self.session.pk, [1, 2]), [1])
+        self.session.refresh_from_db()
+        self.assertEqual(self.session.count_booked_seats(), 2)
+        self.assertEqual(self.session.available_seats, 48)
+
+    def test_wallet_entries_are_read_only_in_admin(self):
+        order = book_seats(self.user, self.session, self.seat_ids[:1])
+        entry = order.wallet_entries.get()
+        self.client.force_login(SuperUserFactory())
+        response = self.client.get(reverse('admin:cinema_walletentry_change', args=[entry.pk]))
+        self.assertEqual(response.status_code, 200)
+        self.assertNotContains(response, 'name="amount"')
+        response = self.client.post(reverse('admin:cinema_walletentry_delete', args=[entry.pk]), {'post': 'yes'})
+        self.assertEqual(response.status_code, 403)
+        self.assertTrue(WalletEntry.objects.filter(pk=entry.pk).exists())
+
+
+class AvailableSeatsTests(TestCase):
+    @override_settings(MEDIA_ROOT=media_for_tests)
+    def setUp(self):
+        self.hall = MovieHallFactory(rows=2, seats_per_row=5)
+        self.hall.create_seats_for_hall()
+        self.session = SessionTodayFactory(hall=self.hall)
+
+    def test_create_and_delete_session_seats(self):
+        self.session.create_session_seats()
+        self.session.refresh_from_db()
+        self.assertEqual(self.session.available_seats, 10)
+        self.session.delete_session_seats()
+        self.session.refresh_from_db()
+        self.assertEqual(self.session.available_seats, 0)
+
+    def test_reconcile_available_seats(self):
+        self.session.create_session_seats()
+        Session.objects.filter(pk=self.session.pk).update(available_seats=3)
+        call_command('reconcile_available_seats', stdout=StringIO())
+        self.session.refresh_from_db()
+        self.assertEqual(self.session.available_seats, 10)
+        self.assertEqual(Session.objects.reconcile_available_seats(), 0)
+
+
+class SeatHoldTests(TestCase):
+    @override_settings(MEDIA_ROOT=media_for_tests)
+    def setUp(self):
+        self.user = UserFactory()
+        self.other_user = UserFactory()
+        self.hall = MovieHallFactory(rows=2, seats_per_row=5)
+        self.hall.create_seats_for_hall()
+        self.session = SessionTodayFactory(hall=self.hall, price=10)
+        self.session.create_session_seats()
+        self.seat_ids = list(self.hall.seats.order_by('pk').values_list('pk', flat=True))
+
+    def test_invalid_seat_ids(self):
+        for seat_ids in (['abc'], [None], []):
+            with self.assertRaises(BookingError):
+                hold_seats(self.user, self.session, seat_ids)
+            with self.assertRaises(BookingError):
+                book_seats(self.user, self.session, seat_ids)
+        self.assertFalse(Order.objects.exists())
+
+    def test_held_seats_are_unavailable_for_other_users(self):
+        hold_seats(self.user, self.session, self.seat_ids[:2])
+        self.assertEqual(self.session.get_free_session_seats(self.other_user).count(), 8)
+        self.assertEqual(self.session.get_free_session_seats(self.user).count(), 10)
+        with self.assertRaises(SeatsUnavailable):
+            hold_seats(self.other_user, self.session, self.seat_ids[1:3])
+        with self.assertRaises(SeatsUnavailable):
+            book_seats(self.other_user, self.session, self.seat_ids[:1])
+
+    def test_book_held_seats(self):
+        hold_seats(self.user, self.session, self.seat_ids[:2])
+        book_seats(self.user, self.session, self.seat_ids[:2])
+        self.assertFalse(SeatHold.objects.exists())
+        self.assertEqual(SessionSeat.objects.filter(session=self.session, is_booked=True).count(), 2)
+
+    def test_expired_holds(self):
+        hold_seats(self.user, self.session, self.seat_ids[:2])
+        SeatHold.objects.update(expires_at=datetime.now() - timedelta(seconds=1))
+        hold_seats(self.other_user, self.session, self.seat_ids[1:2])
+        self.assertEqual(SeatHold.objects.sweep_expired(), 1)
+        self.assertEqual(list(SeatHold.objects.values_list('user', flat=True)), [self.other_user.pk])
+
+
+class LazySessionSeatsTests(TestCase):
+    @override_settings(MEDIA_ROOT=media_for_tests, SESSION_SEATS_MODE="lazy")
+    def setUp(self):
+        self.user = UserFactory()
+        self.other_user = UserFactory()
+        self.hall = MovieHallFactory(rows=2, seats_per_row=5)
+        self.hall.create_seats_for_hall()
+        self.session = SessionTodayFactory(hall=self.hall, price=10)
+        self.session.create_session_seats()
+        self.seat_ids = list(self.hall.seats.order_by('pk').values_list('pk', flat=True))
+
+    def test_create_session_seats(self):
+        self.session.refresh_from_db()
+        self.assertTrue(self.session.lazy_seats)
+        self.assertFalse(self.session.session_seats.exists())
+        self.assertEqual(self.session.available_seats, 10)
+        self.assertEqual([seat.seat_id for seat in self.session.get_free_session_seats()], self.seat_ids)
+
+    def test_book_seats(self):
+        order = book_seats(self.user, self.session, self.seat_ids[:2])
+        self.session.refresh_from_db()
+        self.assertEqual(self.session.available_seats, 8)
+        self.assertEqual(
+            set(self.session.session_seats.filter(is_booked=True, order=order).values_list('seat_id', flat=True)),
+            set(self.seat_ids[:2])
+        )
+        self.assertEqual(len(self.session.get_free_session_seats()), 8)
+        with self.assertRaises(SeatsUnavailable):
+            book_seats(self.other_user, self.session, self.seat_ids[1:3])
+        self.assertEqual(self.session.session_seats.count(), 2)
+
+    def test_held_seats(self):
+        hold_seats(self.user, self.session, self.seat_ids[:1])
+        with self.assertRaises(SeatsUnavailable):
+            hold_seats(self.other_user, self.session, self.seat_ids[:1])
+        self.assertEqual(len(self.session.get_free_session_seats(self.other_user)), 9)
+
+    def test_cancel_order(self):
+        order = book_seats(self.user, self.session, self.seat_ids[:2])
+        cancel_order(order)
+        self.session.refresh_from_db()
+        self.assertFalse(self.session.session_seats.exists())
+        self.assertEqual(self.session.available_seats, 10)
+        self.assertEqual(Session.objects.reconcile_available_seats(), 0)
+
+
+class BenchBookingTests(TransactionTestCase):
+    @override_settings(MEDIA_ROOT=media_for_tests)
+    def test_bench_booking(self):
+        name = connection.settings_dict['NAME']
+        for target in ('api', 'view'):
+            out = StringIO()
+            call_command(
+                'bench_booking', '--target', target, '--users', '12', '--workers', '4', '--attempts', '2',
+                '--rows', '2', '--seats-per-row', '5', stdout=out
+            )
+            report = json.loads(out.getvalue())
+            self.assertEqual(report['attempts'], 24)
+            self.assertGreater(report['bookings'], 0)
+            self.assertEqual(report['double_booked_seats'], [])
+            self.assertEqual(report['booked_seats'], report['bookings'] * 2)
+            self.assertEqual(report['booked_rows'], report['booked_seats'])
+            self.assertEqual(report['occupancy_bits'], report['booked_seats'])
+        self.assertEqual(connection.settings_dict['NAME'], name)
+        self.assertFalse(MovieHall.objects.exists())
+        self.assertFalse(WalletEntry.objects.exists())
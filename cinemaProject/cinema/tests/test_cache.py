@@ -0,0 +1,80 @@
+import os
+from datetime import date, datetime, time, timedelta
+from django.conf import settings
+from django.core.cache import cache
+from django.test import TestCase, override_settings
+from django.urls import reverse
+from unittest.mock import patch
+from cinema.booking import book_seats
+from cinema.cache import get_listing_version, listing_cutoff
+from cinema.factories import MovieHallFactory, SessionTomorrowFactory, UserFactory
+from cinema.models import Session
+
+media_for_tests = os.path.join(settings.BASE_DIR, 'media_for_tests')
+
+
+class SessionListingCacheTests(TestCase):
+    @override_settings(MEDIA_ROOT=media_for_tests)
+    def setUp(self):
+        cache.clear()
+        self.user = UserFactory()
+        self.user.money = 1000
+        self.user.save(update_fields=['money'])
+        self.hall = MovieHallFactory(rows=2, seats_per_row=5)
+        self.hall.create_seats_for_hall()
+        self.session = SessionTomorrowFactory(hall=self.hall, price=10)
+        self.session.create_session_seats()
+        self.tomorrow = date.today() + timedelta(days=1)
+
+    def test_anonymous_listing_is_cached(self):
+        response = self.client.get(reverse('tomorrow'))
+        self.assertContains(response, "Available seats: 10")
+        with self.assertNumQueries(0):
+            cached = self.client.get(reverse('tomorrow'))
+        self.assertEqual(cached.content, response.content)
+
+    def test_cache_key_depends_on_query(self):
+        self.client.get(reverse('tomorrow'))
+        with self.assertNumQueries(2):
+            self.client.get(reverse('tomorrow'), {"sort_by": "price"})
+
+    def test_booking_bumps_version(self):
+        self.client.get(reverse('tomorrow'))
+        version = get_listing_version(self.tomorrow)
+        book_seats(self.user, self.session, self.hall.seats.values_list('pk', flat=True)[:2])
+        self.assertNotEqual(get_listing_version(self.tomorrow), version)
+        self.assertContains(self.client.get(reverse('tomorrow')), "Available seats: 8")
+
+    def test_session_update_bumps_old_and_new_day(self):
+        today_version = get_listing_version(date.today())
+        tomorrow_version = get_listing_version(self.tomorrow)
+        self.session.session_date = date.today()
+        self.session.save()
+        self.assertNotEqual(get_listing_version(date.today()), today_version)
+        self.assertNotEqual(get_listing_version(self.tomorrow), tomorrow_version)
+
+    def test_hall_update_bumps_version(self):
+        version = get_listing_version(self.tomorrow)
+        self.hall.rows = 3
+        self.hall.save()
+        self.hall.relayout_seats()
+        self.assertNotEqual(get_listing_version(self.tomorrow), version)
+        self.assertContains(self.client.get(reverse('tomorrow')), "Available seats: 15")
+
+    def test_authenticated_listing_is_not_cached(self):
+        self.client.force_login(self.user)
+        self.client.get(reverse('tomorrow'))
+        Session.objects.filter(pk=self.session.pk).update(available_seats=3)
+        self.assertContains(self.client.get(reverse('tomorrow')), "Available seats: 3")
+
+    def test_api_listing_is_cached(self):
+        response = self.client.get(reverse('session-tomorrow'))
+        with self.assertNumQueries(0):
+            self.assertEqual(self.client.get(reverse('session-tomorrow')).json(), response.json())
+        SessionTomorrowFactory(hall=MovieHallFactory(), movie=self.session.movie)
+        self.assertEqual(len(self.client.get(reverse('session-tomorrow')).json()['results']), 2)
+
+    @patch('cinema.cache.datetime')
+    def test_listing_cutoff_is_bucketed_per_minute(self, mocked_datetime):
+        mocked_datetime.now.return_value = datetime(2024, 1, 1, 12, 30, 45, 500)
+        self.assertEqual(listing_cutoff(), time(12, 30))
@@ -0,0 +1,70 @@
+from datetime import date
+from io import StringIO
+from django.core.management import call_command
+from django.db.models import Sum
+from django.test import TestCase
+from cinema.bitmap import SeatBitmap
+from cinema.models import Movie, MovieActor, Order, Seat, Session, SessionSeat, WalletEntry
+from core.models import User
+
+
+class GenerateDatasetTests(TestCase):
+    def generate(self, *args):
+        call_command(
+            'generate_dataset', '--chunk-size', '7', '--movies', '3', '--actors', '6', '--directors', '2',
+            '--genres', '3', '--cast-size', '2', '--halls', '2', '--rows', '3', '--seats-per-row', '4', '--days', '2',
+            '--sessions-per-day', '3', '--users', '4', '--orders', '10', *args, stdout=StringIO()
+        )
+
+    def test_generate_dataset(self):
+        self.generate()
+        self.assertEqual(Movie.objects.count(), 3)
+        self.assertEqual(MovieActor.objects.count(), 6)
+        self.assertEqual(Seat.objects.count(), 24)
+        self.assertEqual(Session.objects.count(), 6)
+        self.assertEqual(SessionSeat.objects.count(), 72)
+        self.assertEqual(User.objects.count(), 4)
+        self.assertEqual(Order.objects.count(), 10)
+
+        for session in Session.objects.all():
+            self.assertFalse(Session.objects.exists_overlapping(
+                session.hall, session.session_date, session.time_start, session.time_end, session.pk
+            ))
+            booked = session.session_seats.filter(is_booked=True)
+            self.assertEqual(session.available_seats, 12 - booked.count())
+            self.assertEqual(SeatBitmap(session.occupancy).count(), booked.count())
+        for user in User.objects.all():
+            spent = -(user.wallet_entries.aggregate(total=Sum('amount'))['total'] or 0)
+            self.assertEqual(user.total_spent, spent)
+        self.assertEqual(WalletEntry.objects.count(), 10)
+
+    def test_sessions_that_do_not_fit_are_skipped(self):
+        self.generate('--sessions-per-day', '20')
+        self.assertLess(Session.objects.filter(session_date=date.today()).count(), 20)
+        for session in Session.objects.all():
+            self.assertFalse(Session.objects.exists_overlapping(
+                session.hall, session.session_date, session.time_start, session.time_end, session.pk
+            ))
+
+    def test_lazy_sessions_only_store_booked_seats(self):
+        self.generate('--lazy')
+        self.assertFalse(SessionSeat.objects.filter(is_booked=False).exists())
+        self.assertEqual(
+            SessionSeat.objects.count(),
+            sum(12 - session.available_seats for session in Session.objects.all())
+        )
+
+    def test_generate_dataset_is_deterministic(self):
+        self.generate()
+        first = list(Movie.objects.order_by('pk').values_list('name', 'rating'))
+        booked = list(SessionSeat.objects.filter(is_booked=True).order_by('pk').values_list(
+            'seat__row_number', 'seat__seat_number'
+        ))
+        Movie.objects.update(name='')
+        for model in (WalletEntry, SessionSeat, Order, User, Session, MovieActor):
+            model.objects.all().delete()
+        self.generate()
+        self.assertEqual(list(Movie.objects.exclude(name='').order_by('pk').values_list('name', 'rating')), first)
+        self.assertEqual(list(SessionSeat.objects.filter(is_booked=True).order_by('pk').values_list(
+            'seat__row_number', 'seat__seat_number'
+        )), booked)
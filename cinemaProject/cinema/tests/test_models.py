@@ -0,0 +1,103 @@
+import os
+from datetime import time
+from django.conf import settings
+from django.db import connection
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from rest_framework.exceptions import ValidationError
+from api.serializers import MovieHallSerializer
+from cinema.booking import book_seats
+from cinema.factories import MovieHallFactory, SessionTodayFactory, UserFactory
+from cinema.models import HallHasBookedSeats, Seat, Session, SessionSeat
+
+media_for_tests = os.path.join(settings.BASE_DIR, 'media_for_tests')
+
+
+class MovieHallRelayoutTests(TestCase):
+    @override_settings(MEDIA_ROOT=media_for_tests)
+    def setUp(self):
+        self.hall = MovieHallFactory(rows=2, seats_per_row=3)
+        self.hall.create_seats_for_hall()
+        self.session = SessionTodayFactory(hall=self.hall)
+        self.session.create_session_seats()
+        self.seats = self.get_seats()
+
+    def get_seats(self):
+        return {(row, seat): pk for pk, row, seat in self.hall.seats.values_list('pk', 'row_number', 'seat_number')}
+
+    def relayout(self, rows, seats_per_row):
+        self.hall.rows = rows
+        self.hall.seats_per_row = seats_per_row
+        self.hall.save()
+        self.hall.relayout_seats()
+        self.session.refresh_from_db()
+
+    def test_add_row(self):
+        self.relayout(3, 3)
+        seats = self.get_seats()
+        self.assertEqual(len(seats), 9)
+        self.assertEqual({key: seats[key] for key in self.seats}, self.seats)
+        self.assertEqual(self.session.session_seats.count(), 9)
+        self.assertEqual(self.session.available_seats, 9)
+
+    def test_remove_seats(self):
+        self.relayout(2, 2)
+        self.assertEqual(self.get_seats(), {key: pk for key, pk in self.seats.items() if key[1] <= 2})
+        self.assertFalse(Seat.objects.filter(hall=self.hall, seat_number=3).exists())
+        self.assertEqual(SessionSeat.objects.filter(session=self.session).count(), 4)
+        self.assertEqual(self.session.available_seats, 4)
+
+    def test_relayout_locks_the_sessions(self):
+        with CaptureQueriesContext(connection) as queries:
+            self.relayout(2, 4)
+        locks = [query['sql'] for query in queries if query['sql'].endswith('FOR UPDATE')]
+        self.assertEqual(len(locks), 1)
+        self.assertIn(Session._meta.db_table, locks[0])
+
+    def test_relayout_with_booked_seats_is_aborted(self):
+        book_seats(UserFactory(), self.session, [self.seats[(1, 1)]])
+        serializer = MovieHallSerializer(self.hall, data={"rows": 1, "seats_per_row": 1}, partial=True)
+        serializer.is_valid(raise_exception=True)
+        with self.assertRaises(ValidationError):
+            serializer.save()
+        self.hall.refresh_from_db()
+        self.session.refresh_from_db()
+        self.assertEqual((self.hall.rows, self.hall.seats_per_row), (2, 3))
+        self.assertEqual(self.get_seats(), self.seats)
+        self.assertEqual(self.session.available_seats, 5)
+        with self.assertRaises(HallHasBookedSeats):
+            self.hall.relayout_seats()
+
+
+class SessionOverlapTests(TestCase):
+    @override_settings(MEDIA_ROOT=media_for_tests)
+    def setUp(self):
+        self.hall = MovieHallFactory()
+        self.session = SessionTodayFactory(hall=self.hall, time_start=time(18, 0), time_end=time(20, 0))
+        self.session_date = self.session.session_date
+
+    def test_overlapping(self):
+        cases = [
+            ((time(17, 0), time(18, 30)), True),
+            ((time(19, 0), time(21, 0)), True),
+            ((time(18, 30), time(19, 0)), True),
+            ((time(17, 0), time(21, 0)), True),
+            ((time(15, 0), time(17, 0)), False),
+            ((time(20, 30), time(22, 0)), False),
+        ]
+        for (time_start, time_end), expected in cases:
+            with self.subTest(time_start=time_start, time_end=time_end):
+                self.assertEqual(
+                    Session.objects.exists_overlapping(self.hall, self.session_date, time_start, time_end),
+                    expected
+                )
+
+    def test_overlapping_excludes_session(self):
+        self.assertFalse(Session.objects.exists_overlapping(
+            self.hall, self.session_date, time(18, 0), time(20, 0), session_pk=self.session.pk
+        ))
+
+    def test_find_conflicts(self):
+        slots = [(time(10, 0), time(12, 0)), (time(19, 30), time(21, 0))]
+        self.assertEqual(list(Session.objects.find_conflicts(self.hall, [self.session_date], slots)), [self.session])
+        self.assertFalse(Session.objects.find_conflicts(self.hall, [self.session_date], slots[:1]).exists())
@@ -0,0 +1,93 @@
+import os
+from datetime import date, time, timedelta
+from io import StringIO
+from django.conf import settings
+from django.core.management import call_command
+from django.core.management.base import CommandError
+from django.db import connection
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from cinema.factories import MovieFactory, MovieHallFactory, SessionTodayFactory
+from cinema.models import MovieHall, Session, SessionSeat
+from cinema.scheduling import MAX_SCHEDULE_DAYS, lock_free_hall, schedule_sessions, SchedulingError
+
+media_for_tests = os.path.join(settings.BASE_DIR, 'media_for_tests')
+
+
+class ScheduleSessionsTests(TestCase):
+    @override_settings(MEDIA_ROOT=media_for_tests)
+    def setUp(self):
+        self.movie = MovieFactory()
+        self.hall = MovieHallFactory(rows=2, seats_per_row=5)
+        self.hall.create_seats_for_hall()
+        self.date_start = date.today() + timedelta(days=3)
+        self.date_end = self.date_start + timedelta(days=2)
+        self.slots = [(time(10, 0), time(12, 0)), (time(14, 0), time(16, 0))]
+
+    def test_schedule_sessions(self):
+        sessions = schedule_sessions(self.movie, self.hall, self.slots, self.date_start, self.date_end, 10)
+        self.assertEqual(len(sessions), 6)
+        self.assertEqual(Session.objects.filter(hall=self.hall).count(), 6)
+        self.assertEqual(
+            set(Session.objects.values_list('session_date', flat=True)),
+            {self.date_start + timedelta(days=day) for day in range(3)}
+        )
+        self.assertEqual(SessionSeat.objects.filter(session__hall=self.hall).count(), 60)
+        self.assertEqual(set(Session.objects.values_list('available_seats', flat=True)), {10})
+
+    def test_schedule_with_contained_session(self):
+        SessionTodayFactory(
+            movie=self.movie, hall=self.hall, session_date=self.date_end, time_start=time(14, 30), time_end=time(15, 0)
+        )
+        with self.assertRaises(SchedulingError):
+            schedule_sessions(self.movie, self.hall, self.slots, self.date_start, self.date_end, 10)
+        self.assertEqual(Session.objects.count(), 1)
+
+    def test_schedule_overlapping_slots(self):
+        slots = self.slots + [(time(11, 0), time(13, 0))]
+        with self.assertRaises(SchedulingError):
+            schedule_sessions(self.movie, self.hall, slots, self.date_start, self.date_end, 10)
+
+    def test_schedule_locks_the_hall(self):
+        with CaptureQueriesContext(connection) as queries:
+            schedule_sessions(self.movie, self.hall, self.slots, self.date_start, self.date_start, 10)
+        locks = [query['sql'] for query in queries if query['sql'].endswith('FOR UPDATE')]
+        self.assertEqual(len(locks), 1)
+        self.assertIn(MovieHall._meta.db_table, locks[0])
+
+    def test_lock_free_hall(self):
+        session = SessionTodayFactory(
+            movie=self.movie, hall=self.hall, session_date=self.date_start, time_start=time(10, 0), time_end=time(12, 0)
+        )
+        with CaptureQueriesContext(connection) as queries:
+            lock_free_hall(self.hall, self.date_start, time(13, 0), time(14, 0))
+            lock_free_hall(self.hall, self.date_start, time(10, 0), time(11, 0), session.pk)
+        self.assertEqual(len([query for query in queries if query['sql'].endswith('FOR UPDATE')]), 2)
+        with self.assertRaises(SchedulingError):
+            lock_free_hall(self.hall, self.date_start, time(11, 0), time(13, 0))
+
+    def test_schedule_range_is_capped(self):
+        date_end = self.date_start + timedelta(days=MAX_SCHEDULE_DAYS)
+        with self.assertRaises(SchedulingError):
+            schedule_sessions(self.movie, self.hall, self.slots, self.date_start, date_end, 10)
+        self.assertFalse(Session.objects.exists())
+        with self.assertRaises(CommandError):
+            call_command(
+                'schedule_sessions', f'--movie={self.movie.pk}', f'--hall={self.hall.pk}',
+                f'--from={self.date_start}', f'--to={date_end}', '--price=10', '--slot=10:00-12:00'
+            )
+
+    def test_schedule_sessions_command(self):
+        out = StringIO()
+        call_command(
+            'schedule_sessions',
+            f'--movie={self.movie.pk}',
+            f'--hall={self.hall.pk}',
+            f'--from={self.date_start}',
+            f'--to={self.date_start}',
+            '--price=10',
+            '--slot=10:00-12:00',
+            '--slot=14:00-16:00',
+            stdout=out
+        )
+        self.assertIn("Created 2 session(s)", out.getvalue())
@@ -0,0 +1,53 @@
+import os
+from unittest.mock import patch
+from django.conf import settings
+from django.test import TestCase, override_settings
+from django.urls import reverse
+from cinema.factories import ActorFactory, DirectorFactory, GenreFactory, MovieFactory
+from cinema.search import search_index, search_movies
+
+media_for_tests = os.path.join(settings.BASE_DIR, 'media_for_tests')
+
+
+class MovieSearchTests(TestCase):
+    @override_settings(MEDIA_ROOT=media_for_tests)
+    def setUp(self):
+        self.actor = ActorFactory(name="Keanu", surname="Reeves")
+        self.genre = GenreFactory(name="Thriller")
+        self.matrix = MovieFactory(name="The Matrix", description="A hacker learns the truth", rating=8.7,
+                                   actors=[self.actor], genres=[self.genre])
+        self.wick = MovieFactory(name="John Wick", description="A retired hitman", rating=7.4, actors=[self.actor])
+        self.documentary = MovieFactory(name="Hackers", description="About the matrix of hackers", rating=9.1,
+                                        directors=[DirectorFactory(name="Iain", surname="Softley")])
+
+    def test_search_by_actor(self):
+        self.assertEqual([movie.pk for movie in search_movies("reeves")], [self.matrix.pk, self.wick.pk])
+
+    def test_title_ranks_above_description(self):
+        self.assertEqual([movie.pk for movie in search_movies("matrix")], [self.matrix.pk, self.documentary.pk])
+
+    def test_search_vector_follows_credit_changes(self):
+        self.actor.surname = "Fishburne"
+        self.actor.save()
+        self.assertEqual(list(search_movies("reeves")), [])
+        self.assertEqual(len(search_movies("fishburne")), 2)
+        self.matrix.genres.remove(self.genre)
+        self.assertEqual(list(search_movies("thriller")), [])
+
+    @patch('cinema.search.uses_search_vector', return_value=False)
+    def test_inverted_index_fallback(self, mocked_vendor):
+        search_index.invalidate()
+        self.assertEqual([movie.pk for movie in search_movies("matrix")], [self.matrix.pk, self.documentary.pk])
+        self.assertEqual([movie.pk for movie in search_movies("keanu reeves")], [self.matrix.pk, self.wick.pk])
+        self.assertEqual(search_movies("softley thriller"), [])
+        self.actor.surname = "Fishburne"
+        self.actor.save()
+        self.assertEqual(len(search_movies("fishburne")), 2)
+
+    def test_search_api(self):
+        response = self.client.get(reverse('movie-search-api'), {"q": "hitman"})
+        self.assertEqual([movie['id'] for movie in response.json()], [self.wick.pk])
+
+    def test_search_page(self):
+        response = self.client.get(reverse('movie-search'), {"q": "softley"})
+        self.assertEqual(list(response.context['movies']), [self.documentary])
@@ -13,8 +13,11 @@ from cinema.factories import (
     SuperUserFactory,
 )
 from django.test import override_settings
+from django.test.utils import CaptureQueriesContext
+from django.db import connection
 from django.conf import settings
 import os
+from cinema.booking import book_seats
 from cinema.models import Session, MovieHall, Seat, SessionSeat, Order
 from unittest.mock import patch
 from django.contrib.messages import get_messages
@@ -51,6 +54,31 @@ class SessionListTests(TestCase):
         sessions = response.context['sessions']
         self.assertEqual(list(sessions), [self.session_tomorrow,])
 
+    def test_session_list_for_staff_query_count(self):
+        self.client.force_login(user=SuperUserFactory())
+        url = reverse("tomorrow")
+        with CaptureQueriesContext(connection) as one_session:
+            self.client.get(url)
+        for _ in range(3):
+            SessionTomorrowFactory(hall=self.hall2, movie=self.session_tomorrow.movie)
+        with CaptureQueriesContext(connection) as many_sessions:
+            response = self.client.get(url)
+        self.assertEqual(len(response.context['sessions']), 4)
+        self.assertEqual(len(one_session), len(many_sessions))
+
+    def test_session_list_staff_flags(self):
+        self.client.force_login(user=SuperUserFactory())
+        self.hall2.create_seats_for_hall()
+        self.session_tomorrow.create_session_seats()
+        self.session_tomorrow.session_seats.filter(pk=self.session_tomorrow.session_seats.first().pk).update(
+            is_booked=True
+        )
+        response = self.client.get(reverse("tomorrow"))
+        session = response.context['sessions'][0]
+        self.assertTrue(session.has_booked_seats)
+        self.assertTrue(session.hall_has_booked_seats)
+        self.assertNotContains(response, reverse('update-hall', kwargs={'pk': self.hall2.pk}))
+
     def test_session_list_today_pagination(self):
         url = reverse("index")
         response = self.client.get(url)
@@ -139,6 +167,25 @@ class SessionCreationViewTest(TestCase):
         self.assertEqual(messages[0].tags, 'success')
         self.assertEqual(str(messages[0]), 'Session has successfully created')
 
+    def test_overlap_is_rechecked_under_hall_lock(self):
+        form_data = {
+            'movie': self.movie.id,
+            'time_start': '18:00:00',
+            'time_end': '19:00:00',
+            'date_start': datetime.now().date(),
+            "date_end": datetime.now().date() + timedelta(days=5),
+            "session_date": self.session.session_date,
+            "price": "6",
+            "hall": self.hall.id,
+        }
+        # the form check passing stands in for a session that was saved after it ran
+        with patch('cinema.forms.SessionFormBase.clean_session_time'):
+            response = self.client.post(reverse('create-session'), data=form_data)
+        self.assertRedirects(response, '/')
+        self.assertEqual(Session.objects.count(), 1)
+        messages = list(get_messages(response.wsgi_request))
+        self.assertEqual(str(messages[0]), '* __all__\n  * session on this time in that hall already exists')
+
     def test_form_invalid_date(self):
         form_data = {
             'movie': self.movie.id,
@@ -254,6 +301,13 @@ class SessionDetailViewTests(TestCase):
         self.assertEqual(response.status_code, 302)
         self.assertEqual(response.url, f'/session/{self.session.id}/')
 
+    def test_post_invalid_seat_ids(self):
+        self.client.force_login(user=self.user)
+        url = reverse('session-detail', kwargs={'session_id': self.session.id})
+        response = self.client.post(url, {'selected_seats': ['abc']}, follow=True)
+        self.assertEqual(response.status_code, 200)
+        self.assertFalse(self.session.session_seats.filter(is_booked=True).exists())
+
 
 class MovieHallUpdateViewTest(TestCase):
     @override_settings(MEDIA_ROOT=media_for_tests)
@@ -280,3 +334,88 @@ class MovieHallUpdateViewTest(TestCase):
         self.assertFalse(MovieHall.objects.filter(name="New Hall Name").exists())
         messages = [m.message for m in get_messages(response.wsgi_request)]
         self.assertIn("* name\n  * This field is required.", messages)
+
+
+class SessionSeatHoldViewTests(TestCase):
+    @override_settings(MEDIA_ROOT=media_for_tests)
+    def setUp(self):
+        self.user = UserFactory()
+        self.hall = MovieHallFactory(rows=2, seats_per_row=5)
+        self.hall.create_seats_for_hall()
+        self.session = SessionTodayFactory(hall=self.hall)
+        self.session.create_session_seats()
+        self.url = reverse('session-seat-hold', kwargs={'session_id': self.session.id})
+        self.seat = self.hall.seats.first()
+
+    def test_hold_and_release(self):
+        self.client.force_login(user=self.user)
+        response = self.client.post(self.url, {'selected_seats': [self.seat.id]})
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(self.session.seat_holds.filter(seat=self.seat, user=self.user).exists())
+        response = self.client.post(self.url, {'selected_seats': [self.seat.id], 'release': '1'})
+        self.assertEqual(response.status_code, 200)
+        self.assertFalse(self.session.seat_holds.exists())
+
+    def test_hold_seat_held_by_other_user(self):
+        self.client.force_login(user=UserFactory())
+        self.client.post(self.url, {'selected_seats': [self.seat.id]})
+        self.client.force_login(user=self.user)
+        response = self.client.post(self.url, {'selected_seats': [self.seat.id]})
+        self.assertEqual(response.status_code, 409)
+
+    def test_hold_invalid_seat_ids(self):
+        self.client.force_login(user=self.user)
+        for data in ({'selected_seats': ['abc']}, {'selected_seats': ['abc'], 'release': '1'}):
+            response = self.client.post(self.url, data)
+            self.assertEqual(response.status_code, 409)
+        self.assertFalse(self.session.seat_holds.exists())
+
+
+class UserOrdersViewTests(TestCase):
+    @override_settings(MEDIA_ROOT=media_for_tests)
+    def setUp(self):
+        self.user = UserFactory()
+        self.user.money = 1000
+        self.user.save(update_fields=['money'])
+        self.client.force_login(user=self.user)
+        self.hall = MovieHallFactory(rows=2, seats_per_row=5)
+        self.hall.create_seats_for_hall()
+        self.session = SessionTomorrowFactory(hall=self.hall, price=10)
+        self.session.create_session_seats()
+        self.seat_ids = list(self.hall.seats.order_by('pk').values_list('pk', flat=True))
+
+    def test_orders_are_grouped(self):
+        first = book_seats(self.user, self.session, self.seat_ids[:3])
+        second = book_seats(self.user, self.session, self.seat_ids[3:4])
+        response = self.client.get(reverse('orders'))
+        orders = response.context['orders']
+        self.assertEqual([order.pk for order in orders], [second.pk, first.pk])
+        self.assertEqual((orders[1].seats_count, orders[1].total_price), (3, 30))
+        self.assertEqual(orders[1].movie_name, self.session.movie.name)
+        self.assertEqual([session_seat.seat_id for session_seat in orders[1].seats], self.seat_ids[:3])
+
+    def test_total_price_is_the_purchase_price(self):
+        book_seats(self.user, self.session, self.seat_ids[:3])
+        Session.objects.filter(pk=self.session.pk).update(price=25)
+        response = self.client.get(reverse('orders'))
+        self.assertEqual(response.context['orders'][0].total_price, 30)
+
+    def test_orders_are_paged_by_keyset(self):
+        orders = [book_seats(self.user, self.session, [seat_id]) for seat_id in self.seat_ids]
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(reverse('orders'))
+        self.assertEqual([order.pk for order in response.context['orders']], [order.pk for order in orders[:1:-1]])
+        self.assertFalse([query for query in queries if 'COUNT(*)' in query['sql'] or 'OFFSET' in query['sql']])
+        response = self.client.get(reverse('orders'), {'before': response.context['next_before']})
+        self.assertEqual([order.pk for order in response.context['orders']], [orders[1].pk, orders[0].pk])
+        self.assertIsNone(response.context['next_before'])
+
+    def test_query_count_does_not_depend_on_orders(self):
+        book_seats(self.user, self.session, self.seat_ids[:1])
+        with CaptureQueriesContext(connection) as one_order:
+            self.client.get(reverse('orders'))
+        for seat_id in self.seat_ids[1:8]:
+            book_seats(self.user, self.session, [seat_id])
+        with CaptureQueriesContext(connection) as many_orders:
+            self.client.get(reverse('orders'))
+        self.assertEqual(len(one_order), len(many_orders))
@@ -5,9 +5,11 @@ from cinema.views import (
     MovieHallCreationView,
     SessionCreationView,
     SessionDetail,
+    SessionSeatHoldView,
     MovieHallUpdateView,
     SessionUpdateView,
-    UserOrdersView
+    UserOrdersView,
+    MovieSearchView,
 )
 
 urlpatterns = [
@@ -16,7 +18,9 @@ urlpatterns = [
     path('create-movie-hall/', MovieHallCreationView.as_view(), name='create-movie-hall'),
     path('create-session/', SessionCreationView.as_view(), name="create-session"),
     path('session/<int:session_id>/', SessionDetail.as_view(), name="session-detail"),
+    path('session/<int:session_id>/hold/', SessionSeatHoldView.as_view(), name="session-seat-hold"),
     path('update-hall/<int:pk>/', MovieHallUpdateView.as_view(), name="update-hall"),
     path('update-session/<int:pk>', SessionUpdateView.as_view(), name="update-session"),
     path('orders/', UserOrdersView.as_view(), name="orders"),
+    path('movies/search/', MovieSearchView.as_view(), name="movie-search"),
 ]
@@ -1,41 +1,72 @@
-from datetime import datetime
 from django.contrib import messages
 from django.contrib.auth.mixins import LoginRequiredMixin
-from django.shortcuts import redirect
-from django.views.generic import ListView, CreateView, DetailView, UpdateView
-from .models import Session, MovieHall, Order, SessionSeat
+from django.db import transaction
+from django.http import JsonResponse
+from django.shortcuts import redirect, get_object_or_404
+from django.views.generic import ListView, CreateView, DetailView, UpdateView, View
+from .models import HallHasBookedSeats, Session, MovieHall, Order, Movie
 from datetime import date, timedelta
 from .forms import MovieHallCreationForm, SessionCreationForm, MovieHallUpdateForm, SessionUpdateForm
 from core.custom_mixins import StaffRequiredMixin
 from .utils import create_order, is_buying, ordering
+from .booking import hold_seats, release_holds, BookingError
+from .cache import CachedListingMixin, listing_cutoff
+from .scheduling import lock_free_hall, SchedulingError
+from .search import search_movies
 
 
-class SessionListToday(ListView):
+class SessionListToday(CachedListingMixin, ListView):
     model = Session
     context_object_name = "sessions"
     template_name = "cinema/sessions.html"
     paginate_by = 8
+    listing_name = "today"
+
+    def get_listing_day(self):
+        return date.today()
+
+    def get_listing_cutoff(self):
+        if not hasattr(self, 'cutoff'):
+            self.cutoff = listing_cutoff()
+        return self.cutoff
 
     def get_queryset(self):
-        queryset = Session.objects.filter(
-            session_date=date.today(),
-            time_start__gte=datetime.now().time()
-        ).select_related("hall", "movie")
+        queryset = Session.objects.for_listing(staff_flags=self.request.user.is_staff).filter(
+            session_date=self.get_listing_day(),
+            time_start__gte=self.get_listing_cutoff()
+        )
         return ordering(self.request, queryset)
 
 
-class SessionListTomorrow(ListView):
+class SessionListTomorrow(CachedListingMixin, ListView):
     model = Session
     context_object_name = "sessions"
     template_name = "cinema/sessions.html"
     paginate_by = 8
+    listing_name = "tomorrow"
+
+    def get_listing_day(self):
+        return date.today() + timedelta(days=1)
 
     def get_queryset(self):
-        tomorrow = date.today() + timedelta(days=1)
-        queryset = Session.objects.filter(session_date=tomorrow).select_related("hall", "movie")
+        queryset = Session.objects.for_listing(staff_flags=self.request.user.is_staff).filter(
+            session_date=self.get_listing_day()
+        )
         return ordering(self.request, queryset)
 
 
+class MovieSearchView(ListView):
+    model = Movie
+    context_object_name = "movies"
+    template_name = "cinema/movie-search.html"
+
+    def get_queryset(self):
+        query = self.request.GET.get('q', '').strip()
+        if not query:
+            return Movie.objects.none()
+        return search_movies(query)
+
+
 class MovieHallCreationView(StaffRequiredMixin, CreateView):
     model = MovieHall
     form_class = MovieHallCreationForm
@@ -62,10 +93,16 @@ class SessionCreationView(StaffRequiredMixin, CreateView):
     success_url = "/"
 
     def form_valid(self, form):
-        response = super().form_valid(form)
+        session = form.instance
+        try:
+            with transaction.atomic():
+                lock_free_hall(session.hall, session.session_date, session.time_start, session.time_end)
+                response = super().form_valid(form)
+                self.object.create_session_seats()
+        except SchedulingError as error:
+            form.add_error(None, str(error))
+            return self.form_invalid(form)
         messages.success(self.request, "Session has successfully created")
-        session = self.object
-        session.create_session_seats()
         return response
 
     def form_invalid(self, form):
@@ -95,14 +132,14 @@ class SessionDetail(LoginRequiredMixin, DetailView):
 
     def get(self, request, *args, **kwargs):
         session = self.get_object()
-        if session.get_available_seats == 0:
+        if session.available_seats == 0:
             messages.error(request, "Seats on that session are sold")
             return redirect("index")
         return super().get(request, *args, **kwargs)
 
     def get_context_data(self, **kwargs):
         context = super().get_context_data(**kwargs)
-        context["session_seats"] = self.object.session_seats.filter(is_booked=False)
+        context["session_seats"] = self.object.get_free_session_seats(self.request.user)
         return context
 
     def dispatch(self, request, *args, **kwargs):
@@ -113,6 +150,22 @@ class SessionDetail(LoginRequiredMixin, DetailView):
         return super().dispatch(request, *args, **kwargs)
 
 
+class SessionSeatHoldView(LoginRequiredMixin, View):
+    login_url = "/login/"
+
+    def post(self, request, *args, **kwargs):
+        session = get_object_or_404(Session, pk=self.kwargs.get('session_id'))
+        selected_seats = request.POST.getlist('selected_seats')
+        try:
+            if request.POST.get('release'):
+                release_holds(request.user, session, selected_seats)
+                return JsonResponse({"released": selected_seats})
+            expires_at = hold_seats(request.user, session, selected_seats)
+        except BookingError as error:
+            return JsonResponse({"error": str(error)}, status=409)
+        return JsonResponse({"held": selected_seats, "expires_at": expires_at.isoformat()})
+
+
 class MovieHallUpdateView(StaffRequiredMixin, UpdateView):
     form_class = MovieHallUpdateForm
     model = MovieHall
@@ -120,11 +173,13 @@ class MovieHallUpdateView(StaffRequiredMixin, UpdateView):
     success_url = "/"
 
     def form_valid(self, form):
-        form_instance = form.save(commit=False)
-        form_instance.delete_seats_and_session_seats()
-        response = super().form_valid(form)
-        hall = self.object
-        hall.update_seats_for_hall()
+        try:
+            with transaction.atomic():
+                response = super().form_valid(form)
+                self.object.relayout_seats()
+        except HallHasBookedSeats as error:
+            messages.error(self.request, str(error))
+            return redirect("index")
         messages.success(self.request, "Hall has successfully updated")
         return response
 
@@ -155,11 +210,16 @@ class SessionUpdateView(StaffRequiredMixin, UpdateView):
     success_url = "/"
 
     def form_valid(self, form):
-        form_instance = form.save(commit=False)
-        form_instance.delete_session_seats()
-        response = super().form_valid(form)
-        session = self.object
-        session.create_session_seats()
+        session = form.instance
+        try:
+            with transaction.atomic():
+                lock_free_hall(session.hall, session.session_date, session.time_start, session.time_end, session.pk)
+                session.delete_session_seats()
+                response = super().form_valid(form)
+                self.object.create_session_seats()
+        except SchedulingError as error:
+            form.add_error(None, str(error))
+            return self.form_invalid(form)
         messages.success(self.request, "Session has successfully updated")
         return response
 
@@ -184,11 +244,26 @@ class SessionUpdateView(StaffRequiredMixin, UpdateView):
 
 
 class UserOrdersView(LoginRequiredMixin, ListView):
-    model = SessionSeat
-    context_object_name = "session_seats"
+    model = Order
+    context_object_name = "orders"
     template_name = "cinema/orders.html"
     login_url = "login"
     paginate_by = 8
 
     def get_queryset(self):
-        return SessionSeat.objects.select_related("order", "session__movie", "seat").filter(order__user=self.request.user)
+        orders = Order.objects.summaries(self.request.user)
+        before = self.request.GET.get("before", "")
+        if before.isdigit():
+            orders = orders.filter(id__lt=before)
+        return orders
+
+    def paginate_queryset(self, queryset, page_size):
+        # keyset pages on (user, id) like the api history, no COUNT(*) over the grouped query and no OFFSET
+        orders = list(queryset[:page_size + 1])
+        self.next_before = orders[page_size - 1].pk if len(orders) > page_size else None
+        return None, None, orders[:page_size], False
+
+    def get_context_data(self, **kwargs):
+        context = super().get_context_data(**kwargs)
+        context["next_before"] = self.next_before
+        return context
@@ -50,6 +50,7 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    'core.middleware.QueryBudgetMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
@@ -99,6 +100,11 @@ DATABASES = {
     }
 }
 
+# listing versions live in the cache, so every worker has to share it (e.g. redis://127.0.0.1:6379/1)
+CACHES = {
+    'default': env.cache('CACHE_URL', default='locmemcache://'),
+}
+
 
 # Password validation
 # https://docs.djangoproject.com/en/4.2/ref/settings/#auth-password-validators
@@ -155,11 +161,45 @@ AUTH_USER_MODEL = 'core.User'
 
 LOGIN_REDIRECT_URL = '/'
 
+SEAT_HOLD_LIFETIME = timedelta(minutes=10)
+
+# api tokens of non-staff users are deleted after this much inactivity,
+# User.last_request is written at most once per LAST_REQUEST_WRITE_INTERVAL, the cache keeps the exact time.
+# With the default locmem cache every worker process sees only its own requests, so with several workers
+# the idle check can be early by up to LAST_REQUEST_WRITE_INTERVAL; set a shared CACHE_URL to keep it exact.
+TOKEN_IDLE_TIMEOUT = timedelta(minutes=1)
+LAST_REQUEST_WRITE_INTERVAL = timedelta(seconds=15)
+
+# seconds a resolved api token and its user are cached across requests, 0 disables it.
+# Off with locmem: a token deleted in one worker would stay valid in the others until it expires.
+TOKEN_CACHE_TIMEOUT = env.int(
+    'TOKEN_CACHE_TIMEOUT', default=0 if CACHES['default']['BACKEND'].endswith('LocMemCache') else 5 * 60
+)
+
+# same for site sessions, last_activity in the session is rewritten at most once per LAST_ACTIVITY_WRITE_INTERVAL;
+# the same locmem caveat applies, a worker that has not seen the latest request can log out that much early
+SESSION_IDLE_TIMEOUT = timedelta(minutes=1)
+LAST_ACTIVITY_WRITE_INTERVAL = timedelta(seconds=15)
+
+# "eager" creates a SessionSeat for every hall seat when a session is created,
+# "lazy" keeps free seats only in Session.occupancy and writes SessionSeat rows for sold seats
+SESSION_SEATS_MODE = env('SESSION_SEATS_MODE', default='eager')
+
+# QueryBudgetMiddleware is a debugging aid, it only records queries and sends the X-Query-Count and Server-Timing
+# headers when QUERY_BUDGET_ENABLED is on (DEBUG by default).
+# queries allowed per request, QUERY_BUDGETS overrides it by url name (e.g. {'session-list': 10});
+# over budget or repeated statements are logged to core.query_budget, QUERY_BUDGET_RAISE fails the request instead
+QUERY_BUDGET_ENABLED = env.bool('QUERY_BUDGET_ENABLED', default=DEBUG)
+QUERY_BUDGET_DEFAULT = env.int('QUERY_BUDGET_DEFAULT', default=50)
+QUERY_BUDGETS = {}
+QUERY_REPEAT_THRESHOLD = 5
+QUERY_BUDGET_RAISE = env.bool('QUERY_BUDGET_RAISE', default=False)
+
 REST_FRAMEWORK = {
-    'DEFAULT_PAGINATION_CLASS': 'rest_framework.pagination.PageNumberPagination',
+    'DEFAULT_PAGINATION_CLASS': 'api.pagination.IdCursorPagination',
     'PAGE_SIZE': 10,
     'DEFAULT_AUTHENTICATION_CLASSES': [
-        'rest_framework.authentication.TokenAuthentication',
+        'api.authentication.CachedTokenAuthentication',
         'rest_framework_simplejwt.authentication.JWTAuthentication',
     ]
 }
@@ -1,4 +1,11 @@
 from django.contrib import admin
 from core import models
 
-admin.site.register(models.User)
+
+@admin.register(models.User)
+class UserAdmin(admin.ModelAdmin):
+    def save_model(self, request, obj, form, change):
+        super().save_model(request, obj, form, change)
+        # a plain save leaves the balance alone, a top-up from the admin is written explicitly
+        if change and 'money' in form.changed_data:
+            obj.save(update_fields=['money'])
@@ -1,18 +1,109 @@
-from datetime import datetime, timedelta
+import json
+import logging
+import re
+import time
+from collections import Counter
+from contextlib import ExitStack
+from datetime import datetime
+from django.conf import settings
 from django.contrib.auth import logout
+from django.core.cache import cache
+from django.db import connections
 from django.shortcuts import redirect
 from django.utils.deprecation import MiddlewareMixin
 
+logger = logging.getLogger("core.query_budget")
+
+IN_LIST_RE = re.compile(r"IN \((?:%s, )*%s\)")
+LITERAL_RE = re.compile(r"'(?:[^']|'')*'|\b\d+\b")
+
+
+def last_activity_key(session_key):
+    return f"last-activity:{session_key}"
+
 
 class AutoLogoutMiddleware(MiddlewareMixin):
     def process_request(self, request):
         if request.user.is_authenticated:
             if not request.user.is_staff:
+                now = datetime.now()
+                key = last_activity_key(request.session.session_key)
                 last_activity = request.session.get('last_activity')
-                last_activity_from_iso = datetime.fromisoformat(last_activity)
-                if last_activity_from_iso and datetime.now() - last_activity_from_iso > timedelta(minutes=1):
+                stored = datetime.fromisoformat(last_activity) if last_activity else None
+                last_activity_from_iso = max(filter(None, (stored, cache.get(key))), default=None)
+                if last_activity_from_iso and now - last_activity_from_iso > settings.SESSION_IDLE_TIMEOUT:
                     logout(request)
+                    cache.delete(key)
                     return redirect('/login/')
                 else:
-                    current_time_iso = datetime.now().isoformat()
-                    request.session['last_activity'] = current_time_iso
+                    # the cache keeps the exact time, the session row is only rewritten once per interval
+                    cache.set(key, now, timeout=settings.SESSION_IDLE_TIMEOUT.total_seconds())
+                    if stored is None or now - stored > settings.LAST_ACTIVITY_WRITE_INTERVAL:
+                        request.session['last_activity'] = now.isoformat()
+
+
+class QueryBudgetExceeded(Exception):
+    pass
+
+
+def fingerprint(sql):
+    sql = IN_LIST_RE.sub("IN (...)", sql)
+    return " ".join(LITERAL_RE.sub("?", sql).split())
+
+
+class QueryRecorder:
+    def __init__(self):
+        self.count = 0
+        self.duration = 0
+        self.statements = Counter()
+
+    def __call__(self, execute, sql, params, many, context):
+        started = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.count += 1
+            self.duration += time.perf_counter() - started
+            self.statements[fingerprint(sql)] += 1
+
+    def repeated(self, threshold):
+        return [(statement, count) for statement, count in self.statements.most_common() if count >= threshold]
+
+
+class QueryBudgetMiddleware:
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        if not settings.QUERY_BUDGET_ENABLED:
+            return self.get_response(request)
+
+        recorder = QueryRecorder()
+        with ExitStack() as stack:
+            for connection in connections.all():
+                stack.enter_context(connection.execute_wrapper(recorder))
+            response = self.get_response(request)
+
+        view_name = request.resolver_match.view_name if request.resolver_match else None
+        budget = settings.QUERY_BUDGETS.get(view_name, settings.QUERY_BUDGET_DEFAULT)
+        repeated = recorder.repeated(settings.QUERY_REPEAT_THRESHOLD)
+        db_ms = recorder.duration * 1000
+
+        response["X-Query-Count"] = str(recorder.count)
+        response["Server-Timing"] = f'db;dur={db_ms:.1f};desc="{recorder.count} queries"'
+
+        over_budget = budget is not None and recorder.count > budget
+        level = logging.WARNING if over_budget or repeated else logging.DEBUG
+        if logger.isEnabledFor(level):
+            logger.log(level, json.dumps({
+                "method": request.method,
+                "path": request.path,
+                "view": view_name,
+                "queries": recorder.count,
+                "db_ms": round(db_ms, 1),
+                "budget": budget,
+                "repeated": [{"sql": statement, "count": count} for statement, count in repeated],
+            }))
+        if over_budget and settings.QUERY_BUDGET_RAISE:
+            raise QueryBudgetExceeded(f"{view_name or request.path} ran {recorder.count} queries, the budget is {budget}")
+        return response
@@ -0,0 +1,33 @@
+# Generated by Django 4.2 on 2026-10-18 22:36
+
+from django.db import migrations, models
+from django.db.models import DecimalField, OuterRef, Subquery, Sum
+from django.db.models.functions import Coalesce
+
+
+def fill_total_spent(apps, schema_editor):
+    User = apps.get_model('core', 'User')
+    WalletEntry = apps.get_model('cinema', 'WalletEntry')
+    spent = WalletEntry.objects.filter(user=OuterRef('pk')).order_by().values('user').annotate(
+        spent=-Sum('amount')
+    ).values('spent')
+    User.objects.update(
+        total_spent=Coalesce(Subquery(spent, output_field=DecimalField()), 0, output_field=DecimalField())
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0004_user_last_request'),
+        ('cinema', '0008_walletentry'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='user',
+            name='total_spent',
+            field=models.DecimalField(decimal_places=2, default=0, editable=False, max_digits=10),
+        ),
+        migrations.RunPython(fill_total_spent, migrations.RunPython.noop),
+    ]
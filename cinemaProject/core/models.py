@@ -3,16 +3,20 @@ from datetime import datetime
 from django.db import models
 from django.contrib.auth.models import AbstractUser
 from core.managers import ExtendedUserManager
-from django.db.models import Sum
+from django.db.models import F
 from django.utils import timezone
 from django.utils.timezone import make_aware
 
 
 class User(AbstractUser):
     money = models.DecimalField(max_digits=10, decimal_places=2, default=0.00)
+    total_spent = models.DecimalField(max_digits=10, decimal_places=2, default=0, editable=False)
     last_request = models.DateTimeField(auto_now_add=True)
     objects = ExtendedUserManager()
 
+    # maintained by conditional updates in debit/credit, saving a stale instance must not overwrite them
+    BALANCE_FIELDS = ("money", "total_spent")
+
     def __str__(self):
         return f"{self.username}, {self.last_request}"
 
@@ -24,16 +28,36 @@ class User(AbstractUser):
 
         if not self.pk:
             self.money = 200
+        elif not self._state.adding and kwargs.get('update_fields') is None:
+            kwargs['update_fields'] = [
+                field.name for field in self._meta.concrete_fields
+                if not field.primary_key and field.name not in self.BALANCE_FIELDS
+            ]
         super().save(*args, **kwargs)
 
-    def buy_ticket(self, price):
-        self.money -= price
-        self.save()
-
-    def total_spent(self):
-        return self.orders.aggregate(total_spent=Sum('purchase_price'))['total_spent'] or 0.00
+    def debit(self, amount):
+        debited = User.objects.filter(pk=self.pk, money__gte=amount).update(
+            money=F('money') - amount,
+            total_spent=F('total_spent') + amount
+        )
+        if debited:
+            self.money -= amount
+            self.total_spent += amount
+        return bool(debited)
+
+    def credit(self, amount):
+        User.objects.filter(pk=self.pk).update(money=F('money') + amount, total_spent=F('total_spent') - amount)
+        self.money += amount
+        self.total_spent -= amount
 
     def update_last_request(self):
         self.last_request = datetime.now()
         self.save()
         return self.last_request
+
+    def touch_last_request(self, now, interval):
+        if now - self.last_request <= interval:
+            return False
+        User.objects.filter(pk=self.pk, last_request__lt=now - interval).update(last_request=now)
+        self.last_request = now
+        return True
@@ -0,0 +1,93 @@
+import json
+from datetime import datetime, timedelta
+from django.core.cache import cache
+from django.db import connection
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from cinema.factories import UserFactory
+from core.middleware import QueryBudgetExceeded, QueryRecorder, fingerprint, last_activity_key
+
+
+@override_settings(QUERY_BUDGET_ENABLED=True)
+class QueryBudgetMiddlewareTests(TestCase):
+    def setUp(self):
+        self.user = UserFactory()
+        self.client.force_login(user=self.user)
+
+    def test_headers(self):
+        response = self.client.get(reverse('orders'))
+        self.assertGreater(int(response['X-Query-Count']), 0)
+        self.assertTrue(response['Server-Timing'].startswith('db;dur='))
+
+    @override_settings(QUERY_BUDGET_ENABLED=False, QUERY_BUDGETS={'orders': 1}, QUERY_BUDGET_RAISE=True)
+    def test_disabled(self):
+        with self.assertNoLogs('core.query_budget'):
+            response = self.client.get(reverse('orders'))
+        self.assertNotIn('X-Query-Count', response)
+        self.assertNotIn('Server-Timing', response)
+
+    @override_settings(QUERY_BUDGETS={'orders': 1})
+    def test_over_budget_is_logged(self):
+        with self.assertLogs('core.query_budget', 'WARNING') as logs:
+            self.client.get(reverse('orders'))
+        report = json.loads(logs.records[0].getMessage())
+        self.assertEqual((report['view'], report['budget']), ('orders', 1))
+
+    @override_settings(QUERY_BUDGETS={'orders': 1}, QUERY_BUDGET_RAISE=True)
+    def test_over_budget_raises(self):
+        with self.assertLogs('core.query_budget', 'WARNING'), self.assertRaises(QueryBudgetExceeded):
+            self.client.get(reverse('orders'))
+
+    def test_repeated_statements(self):
+        recorder = QueryRecorder()
+        with connection.execute_wrapper(recorder):
+            for user_id in range(3):
+                list(type(self.user).objects.filter(pk__in=[user_id, user_id + 1]))
+        self.assertEqual(recorder.count, 3)
+        self.assertEqual(len(recorder.repeated(3)), 1)
+
+    def test_fingerprint(self):
+        self.assertEqual(
+            fingerprint('SELECT * FROM "seat" WHERE "id" IN (%s, %s, %s) AND "row" = 5'),
+            'SELECT * FROM "seat" WHERE "id" IN (...) AND "row" = ?'
+        )
+
+
+class AutoLogoutMiddlewareTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.user = UserFactory()
+        self.client.force_login(user=self.user)
+
+    def set_last_activity(self, **delta):
+        session = self.client.session
+        session['last_activity'] = (datetime.now() - timedelta(**delta)).isoformat()
+        session.save()
+
+    def get(self):
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(reverse('orders'))
+        return response, [query['sql'] for query in queries if query['sql'].startswith('UPDATE "django_session"')]
+
+    def test_session_writes_are_throttled(self):
+        self.set_last_activity(seconds=30)
+        response, writes = self.get()
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(len(writes), 1)
+        for _ in range(3):
+            response, writes = self.get()
+            self.assertEqual(response.status_code, 200)
+            self.assertEqual(writes, [])
+
+    def test_idle_session_is_logged_out(self):
+        self.set_last_activity(minutes=2)
+        response, _ = self.get()
+        self.assertEqual(response.status_code, 302)
+        self.assertTrue(response.url.startswith('/login/'))
+
+    def test_cached_last_activity_keeps_session_alive(self):
+        self.set_last_activity(minutes=2)
+        cache.set(last_activity_key(self.client.session.session_key), datetime.now() - timedelta(seconds=10))
+        response, _ = self.get()
+        self.assertEqual(response.status_code, 200)
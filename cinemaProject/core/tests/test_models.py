@@ -0,0 +1,24 @@
+from decimal import Decimal
+from django.test import TestCase
+from django.contrib.auth import get_user_model
+
+User = get_user_model()
+
+
+class UserBalanceTests(TestCase):
+    def setUp(self) -> None:
+        self.user = User.objects.create_user(username="ssava", email="ssava@gmail.com", password="example_pass32523")
+
+    def test_save_keeps_concurrent_debit(self):
+        stale = User.objects.get(pk=self.user.pk)
+        self.assertTrue(self.user.debit(50))
+        stale.update_last_request()
+        stale.refresh_from_db()
+        self.assertEqual(stale.money, Decimal(150))
+        self.assertEqual(stale.total_spent, Decimal(50))
+
+    def test_balance_can_be_saved_explicitly(self):
+        self.user.money = 1000
+        self.user.save(update_fields=['money'])
+        self.user.refresh_from_db()
+        self.assertEqual(self.user.money, Decimal(1000))